@@ -2,62 +2,23 @@
 Analyse des appels d'offres
 """
 import streamlit as st
-from pypdf import PdfReader
 from datetime import datetime
 import re
+import config
 import database
-from llm_manager import LLMManager
+from extraction_pdf import champs_soumission, extraire_debut, extraire_pages, joindre_pages
+from faits_cles import extraire_faits, resume_faits
+from llm_budget import pack_sections
+from llm_manager import get_llm_manager
+from llm_mapreduce import analyser_par_blocs
+from nettoyage import normaliser_pages, resume_normalisation
+from pertinence import selectionner_passages
+from similarite import calculer_empreinte, passages_modifies, trouver_doublon
 
 
-llm_manager = LLMManager()
-
-
-def show_analyse_tab(user, projets_antecedents):
-    """Affiche l'onglet d'analyse"""
-    st.header("🔍 Lancer une préqualification")
-    
-    with st.form("analyse_form"):
-        numero_projet = st.text_input("🔢 Numéro du projet")
-        nom_projet = st.text_input("📋 Nom du projet")
-        uploaded_file = st.file_uploader("📄 PDF Appel d'offre", type=['pdf'])
-        submit = st.form_submit_button("🚀 Lancer l'analyse", use_container_width=False)
-    
-    if submit and uploaded_file:
-        if not nom_projet:
-            st.error("❌ Le nom du projet est obligatoire")
-        else:
-            with st.spinner("🤖 Analyse IA en cours..."):
-                try:
-                    reader = PdfReader(uploaded_file)
-                    text = " ".join([page.extract_text() or "" for page in reader.pages])[:8000]
-                    
-                    if not text.strip():
-                        st.error("❌ Le PDF semble vide ou le texte n'a pas pu être extrait")
-                        st.stop()
-                    
-                    today = datetime.today()
-                    today_str = today.strftime("%Y-%m-%d")
-                    
-                    projets_text = "\n".join([
-                        f"- {p['nom_projet']} ({p['montant']}$, {p['duree_jours']} jours): {p['specifications']}"
-                        for p in projets_antecedents
-                    ]) if projets_antecedents else "Aucun projet antérieur fourni."
-                    
-                    prompt_with_context = f"""
-Analysez cet appel d'offres PUBLIC (adressé à toutes les entreprises) pour déterminer si l'entreprise doit soumissionner.
-
-Informations sur l'entreprise :
-- Nom : {user.get('nom_entreprise', 'N/A')}
-- Spécialités : {', '.join(user.get('specialites', [])) if user.get('specialites') else 'Non spécifiées'}
-- NEQ : {user.get('numero_neq', 'N/A')}
-- Licence RBQ : {user.get('licence_rbq', 'N/A')}
-- Adresse : {user.get('adresse', '')}, {user.get('ville', '')}, {user.get('province', '')} {user.get('code_postal', '')}
-- Contact : {user.get('contact_nom', '')}, {user.get('contact_telephone', '')}, {user.get('contact_email', '')}
-
-Projets antérieurs pertinents :
-{projets_text}
-
-DATE DU JOUR : {today_str}
+# Partie fixe du prompt, identique pour toutes les analyses : placée en tête
+# pour profiter de la mise en cache du préfixe chez les fournisseurs
+INSTRUCTIONS_ANALYSE = """Analysez cet appel d'offres PUBLIC (adressé à toutes les entreprises) pour déterminer si l'entreprise doit soumissionner.
 
 ═══════════════════════════════════════════════════════════════
 📋 INSTRUCTIONS CRITIQUES POUR L'ANALYSE - À RESPECTER ABSOLUMENT
@@ -88,7 +49,7 @@ COMMENCER l'analyse par :
 
 1. **Date de visite des lieux** :
    - Identifier la date de visite dans le document
-   - Calculer le délai entre AUJOURD'HUI ({today_str}) et la date de visite
+   - Calculer le délai entre AUJOURD'HUI (DATE DU JOUR indiquée avant le document) et la date de visite
    - Si délai < 5 jours ouvrables : 
      ⚠️ POINT FAIBLE MAJEUR : "La visite des lieux est prévue le [DATE], soit dans seulement X jours ouvrables. Ce délai très court peut compliquer l'organisation et la participation à la visite obligatoire."
    - Si délai ≥ 5 jours ouvrables :
@@ -128,7 +89,7 @@ COMMENCER l'analyse par :
    - Principal enjeu pour CETTE entreprise
 
 3. **DATES CLÉS ET DÉLAIS** ⏰
-   - Date du jour : {today_str}
+   - Date du jour : [DATE DU JOUR]
    - Date visite : [DATE] → Délai : X jours ouvrables [✅/⚠️/❌]
    - Date clôture : [DATE]
    - Délai visite → clôture : X jours ouvrables [✅/⚠️/❌]
@@ -175,7 +136,7 @@ COMMENCER l'analyse par :
 
 ⚠️ RAPPELS FINAUX :
 - ✅ Appel d'offres PUBLIC pour toutes entreprises
-- ✅ Comparer date visite avec AUJOURD'HUI ({today_str})
+- ✅ Comparer date visite avec AUJOURD'HUI (DATE DU JOUR)
 - ✅ Vérifier délai visite → clôture (min 5 jours ouvrables)
 - ✅ 2ème/3ème personne dans l'analyse
 - ✅ 1ère personne dans la recommandation
@@ -183,55 +144,442 @@ COMMENCER l'analyse par :
 - ❌ NE PAS inventer assurances/cautionnement si absents
 - ✅ Comparer avec projets antérieurs
 - ✅ Être CONCIS et PRÉCIS
+"""
+
+
+# Sujets recherchés dans les longs documents (sélection des passages envoyés au modèle)
+TERMES_PREQUALIFICATION = [
+    "visite des lieux obligatoire", "date et heure de clôture", "dépôt des soumissions",
+    "cautionnement de soumission", "garantie d'exécution", "assurance responsabilité",
+    "licence RBQ", "expérience exigée", "critères d'évaluation", "livrables", "échéancier",
+    "durée des travaux", "pénalités de retard", "estimation budget montant", "addenda",
+    "portée des travaux", "lieu adresse", "donneur d'ouvrage"
+]
+
+
+# Notes extraites de chaque partie d'un document trop long pour un seul appel (analyse par parties)
+_NOTES = {"type": "array", "items": {"type": "string"}}
+NOTES_PREQUALIFICATION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "identification": _NOTES,
+        "dates_et_delais": _NOTES,
+        "visite_des_lieux": _NOTES,
+        "montants_et_garanties": _NOTES,
+        "assurances": _NOTES,
+        "admissibilite": _NOTES,
+        "portee_des_travaux": _NOTES,
+        "exigences_particulieres": _NOTES,
+        "penalites_et_risques": _NOTES
+    },
+    "required": [
+        "identification", "dates_et_delais", "visite_des_lieux", "montants_et_garanties", "assurances",
+        "admissibilite", "portee_des_travaux", "exigences_particulieres", "penalites_et_risques"
+    ]
+}
+
+
+# Consigne de l'analyse différentielle (appel d'offres réémis ou modifié par addenda)
+CONSIGNE_DELTA = """
+Cet appel d'offres a déjà été analysé : seuls les passages ci-dessus ont été ajoutés ou
+modifiés depuis (addenda, réémission). Mettez à jour l'analyse précédente en tenant compte
+de ces changements, en conservant sa structure et en signalant explicitement ce qui change
+(dates, exigences, visite, garanties). Terminez par la recommandation et le SCORE, comme demandé.
+"""
+
+
+def construire_prompt_analyse(user, projets_antecedents, text, today_str, budget, provider_type=None,
+                              analyse_precedente=None, faits=None):
+    """
+    Construit le prompt d'analyse en deux parties :
+    - préfixe stable : instructions, puis profil et projets de l'entreprise
+    - suffixe variable : date du jour et texte de l'appel d'offres
+
+    Le tout tient dans `budget` tokens : instructions, profil et date sont
+    gardés en entier, les projets limités à 15 % du reste (lignes entières)
+    et le document reçoit ce qui reste ; s'il dépasse, ses passages les plus
+    pertinents (BM25 sur TERMES_PREQUALIFICATION) sont retenus.
+    Retourne (préfixe, suffixe, rapport).
+
+    Avec `analyse_precedente`, `text` contient seulement les passages modifiés
+    et le modèle met à jour l'analyse existante (même préfixe, donc même cache).
+    `faits` (voir faits_cles.extraire_faits) : dates, montants et délais en jours
+    ouvrables déjà calculés, placés après la date du jour.
+    """
+    projets_text = "\n".join([
+        f"- {p['nom_projet']} ({p['montant']}$, {p['duree_jours']} jours): {p['specifications']}"
+        for p in projets_antecedents
+    ]) if projets_antecedents else "Aucun projet antérieur fourni."
+    
+    profil = f"""
+Informations sur l'entreprise :
+- Nom : {user.get('nom_entreprise', 'N/A')}
+- Spécialités : {', '.join(user.get('specialites', [])) if user.get('specialites') else 'Non spécifiées'}
+- NEQ : {user.get('numero_neq', 'N/A')}
+- Licence RBQ : {user.get('licence_rbq', 'N/A')}
+- Adresse : {user.get('adresse', '')}, {user.get('ville', '')}, {user.get('province', '')} {user.get('code_postal', '')}
+- Contact : {user.get('contact_nom', '')}, {user.get('contact_telephone', '')}, {user.get('contact_email', '')}
+
+Projets antérieurs pertinents :
+"""
+    
+    if analyse_precedente is None:
+        entete_document = f"""
+DATE DU JOUR : {today_str}
 
-### Appel d'offre à analyser :
-{text}
+{resume_faits(faits)}### Appel d'offre à analyser :
 """
-                    
-                    analysis_result = llm_manager.analyze(prompt_with_context, max_tokens=2500)
-                    
-                    if not analysis_result["success"]:
-                        st.error(f"❌ {analysis_result['error']}")
-                        st.stop()
-                    
-                    result = analysis_result["result"]
-                    
-                    st.markdown("### 📋 Résultat de l'analyse IA")
-                    st.markdown("---")
-                    st.markdown(result)
-                    
-                    rec = "INCONNU"
-                    result_upper = result.upper()
-                    if "JE RECOMMANDE GO" in result_upper and "NO-GO" not in result_upper and "NO GO" not in result_upper:
-                        rec = "GO"
-                    elif "NO-GO" in result_upper or "NO GO" in result_upper or "JE RECOMMANDE NO" in result_upper:
-                        rec = "NO-GO"
-                    elif "PEUT-ÊTRE" in result_upper or "MAYBE" in result_upper or "PEUT ÊTRE" in result_upper:
-                        rec = "PEUT-ÊTRE"
-                    
-                    score = 0
-                    score_match = re.search(r"(?:Score|SCORE)\s*[:\-]?\s*(\d+)", result, re.IGNORECASE)
-                    if score_match:
-                        score = int(score_match.group(1))
-                    
-                    soumission_data = {
-                        "numero_projet": numero_projet,
-                        "nom_projet": nom_projet,
-                        "document": uploaded_file,
-                        "analyse_json": {"raw_response": result},
-                        "recommendation": rec,
-                        "score": score,
-                        "statut": "qualifie" if rec == "GO" else "non_qualifie"
-                    }
-                    
-                    soumission = database.save_soumission(user['id'], soumission_data)
-                    
-                    if soumission:
-                        st.success("✅ Analyse sauvegardée dans la base de données !")
-                    else:
-                        st.warning("⚠️ L'analyse a été effectuée mais n'a pas pu être sauvegardée")
+        consigne = ""
+    else:
+        entete_document = f"""
+DATE DU JOUR : {today_str}
+
+{resume_faits(faits)}### Analyse précédente de cet appel d'offres :
+{analyse_precedente}
+
+### Passages ajoutés ou modifiés depuis cette analyse :
+"""
+        consigne = CONSIGNE_DELTA
+    
+    sections, rapport = pack_sections([
+        {"name": "instructions", "text": INSTRUCTIONS_ANALYSE, "required": True},
+        {"name": "profil", "text": profil, "required": True},
+        {"name": "entete_document", "text": entete_document, "required": True},
+        {"name": "consigne", "text": consigne, "required": True},
+        {"name": "projets", "text": projets_text, "max_share": 0.15, "by_lines": True},
+        {"name": "document", "text": text,
+         "fit": lambda texte, max_tokens, fournisseur: selectionner_passages(
+             texte, TERMES_PREQUALIFICATION, max_tokens, fournisseur
+         )}
+    ], budget, provider_type)
+    
+    prefixe = sections["instructions"] + sections["profil"] + sections["projets"] + "\n"
+    suffixe = sections["entete_document"] + sections["document"] + "\n" + sections["consigne"]
+    return prefixe, suffixe, rapport
+
+
+def _interpreter_resultat(result):
+    """Recommandation (GO, NO-GO, PEUT-ÊTRE, INCONNU) et score extraits de la réponse"""
+    rec = "INCONNU"
+    result_upper = result.upper()
+    if "JE RECOMMANDE GO" in result_upper and "NO-GO" not in result_upper and "NO GO" not in result_upper:
+        rec = "GO"
+    elif "NO-GO" in result_upper or "NO GO" in result_upper or "JE RECOMMANDE NO" in result_upper:
+        rec = "NO-GO"
+    elif "PEUT-ÊTRE" in result_upper or "MAYBE" in result_upper or "PEUT ÊTRE" in result_upper:
+        rec = "PEUT-ÊTRE"
+    
+    score = 0
+    score_match = re.search(r"(?:Score|SCORE)\s*[:\-]?\s*(\d+)", result, re.IGNORECASE)
+    if score_match:
+        score = int(score_match.group(1))
+    return rec, score
+
+
+def _notes_par_parties(pages):
+    """Étape « map » de l'analyse par parties, avec une barre de progression"""
+    progression = st.progress(0.0, text="🧩 Lecture du document par parties...")
+    notes, rapport = analyser_par_blocs(
+        pages, NOTES_PREQUALIFICATION_SCHEMA, TERMES_PREQUALIFICATION,
+        on_progress=lambda termines, total: progression.progress(
+            termines / total, text=f"🧩 {termines}/{total} parties du document lues"
+        )
+    )
+    progression.empty()
+    return notes, rapport
+
+
+def _executer_analyse(user, projets_antecedents, attente, mode="complete", passages=None):
+    """
+    Analyse et sauvegarde une soumission.
+    mode : "complete" (document entier), "delta" (passages modifiés depuis
+    l'analyse précédente) ou "reutiliser" (analyse précédente, sans appel LLM).
+    Un document complet qui dépasse le budget est analysé par parties si
+    attente["par_parties"] : notes de chaque bloc en parallèle, puis synthèse.
+    """
+    st.session_state.pop("analyse_en_attente", None)
+    precedente = attente["doublon"][0] if attente["doublon"] else None
+    analyse_json = {}
+    
+    if mode in ("reutiliser", "delta"):
+        soumission_precedente = database.get_soumission(precedente["id"])
+        analyse_precedente = ((soumission_precedente or {}).get("analyse_json") or {}).get("raw_response")
+        if not analyse_precedente:
+            st.error("❌ L'analyse précédente est introuvable, lancez une analyse complète")
+            return
+        analyse_json["reprise_de" if mode == "reutiliser" else "delta_de"] = precedente["id"]
+    
+    if mode == "reutiliser":
+        st.markdown("### 📋 Analyse précédente réutilisée")
+        st.markdown("---")
+        st.markdown(analyse_precedente)
+        result = analyse_precedente
+    else:
+        today_str = datetime.today().strftime("%Y-%m-%d")
+        budget, provider_type = get_llm_manager().input_budget(task="prequalification")
+        prefixe, suffixe, rapport = construire_prompt_analyse(
+            user, projets_antecedents, passages if mode == "delta" else attente["texte"], today_str,
+            budget, provider_type, analyse_precedente if mode == "delta" else None, attente["faits"]
+        )
+        document = next(s for s in rapport["sections"] if s["name"] == "document")
+        if document["truncated"] and mode == "complete" and attente["par_parties"] and attente["pages"]:
+            notes, rapport_parties = _notes_par_parties(attente["pages_normalisees"])
+            if rapport_parties["reussis"]:
+                prefixe, suffixe, rapport = construire_prompt_analyse(
+                    user, projets_antecedents, notes, today_str, budget, provider_type, faits=attente["faits"]
+                )
+                analyse_json["analyse_par_parties"] = rapport_parties
+                st.info(
+                    f"ℹ️ Document long : analysé en {rapport_parties['blocs']} parties "
+                    f"({rapport_parties['echoues']} en échec) en {rapport_parties['secondes']:.0f} s, puis synthétisé"
+                )
+            else:
+                st.warning("⚠️ L'analyse par parties a échoué : seuls les passages les plus pertinents sont analysés")
+        if "analyse_par_parties" not in analyse_json and document["truncated"]:
+            st.info(
+                f"ℹ️ Document long : passages les plus pertinents retenus, {document['tokens']} tokens "
+                f"sur {document['original_tokens']} (limite du modèle)"
+            )
+        
+        st.markdown("### 📋 Résultat de l'analyse IA")
+        st.markdown("---")
+        
+        # Affichage progressif ; l'analyse du texte se fait sur la réponse complète
+        try:
+            result = st.write_stream(
+                get_llm_manager().analyze_stream(
+                    suffixe, prefix=prefixe, task="prequalification"
+                )
+            )
+        except RuntimeError as e:
+            st.error(f"❌ {str(e)}")
+            st.stop()
+    
+    rec, score = _interpreter_resultat(result)
+    attente["document"].seek(0)
+    soumission_data = {
+        "numero_projet": attente["numero_projet"],
+        "nom_projet": attente["nom_projet"],
+        "document": attente["document"],
+        "analyse_json": dict(
+            {"raw_response": result, "empreinte": attente["empreinte"], "normalisation": attente["normalisation"],
+             "faits": attente["faits"]},
+            **champs_soumission(attente["sha256"], attente["pages"]),
+            **analyse_json
+        ),
+        "recommendation": rec,
+        "score": score,
+        "statut": "qualifie" if rec == "GO" else "non_qualifie"
+    }
+    
+    soumission = database.save_soumission(user['id'], soumission_data)
+    
+    if soumission:
+        st.success("✅ Analyse sauvegardée dans la base de données !")
+    else:
+        st.warning("⚠️ L'analyse a été effectuée mais n'a pas pu être sauvegardée")
+
+
+def _proposer_reprise(user, projets_antecedents, attente):
+    """Appel d'offres quasi identique à une soumission déjà analysée : choix du type d'analyse"""
+    precedente, ressemblance = attente["doublon"]
+    passages, stats = passages_modifies(attente["texte"], precedente["empreinte"])
+    
+    choix = st.empty()
+    with choix.container():
+        st.info(
+            f"♻️ Ce document ressemble à {ressemblance:.0%} à « {precedente.get('nom_projet') or 'Sans nom'} » "
+            f"analysé le {(precedente.get('created_at') or '')[:10]} "
+            f"(recommandation : {precedente.get('recommendation', 'N/A')}, score : {precedente.get('score', '—')}). "
+            f"{stats['lignes_nouvelles']} ligne(s) ajoutée(s) ou modifiée(s), "
+            f"{stats['lignes_retirees']} retirée(s)."
+        )
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            reutiliser = st.button("♻️ Réutiliser l'analyse")
+        with col2:
+            delta = st.button("🔀 Analyser les modifications", disabled=not passages)
+        with col3:
+            complete = st.button("🚀 Analyse complète")
+    
+    if reutiliser or delta or complete:
+        choix.empty()
+        mode = "reutiliser" if reutiliser else "delta" if delta else "complete"
+        try:
+            _executer_analyse(user, projets_antecedents, attente, mode, passages)
+        except Exception as e:
+            st.error(f"❌ Erreur lors de l'analyse : {str(e)}")
+
+
+def _lire_appel_offres(fichier, budget, provider_type, complet=False):
+    """
+    Extrait seulement les premières pages : au plus LLM_SELECTION_READ_FACTOR fois
+    le budget du prompt, parmi lesquelles les passages pertinents seront choisis
+    (0 ou `complet` : document entier, pour l'analyse par parties), et au moins
+    le début couvert par l'empreinte (SIMILARITE_PREFIXE_CARACTERES).
+    Retourne (sha256, pages lues, nombre total de pages).
+    """
+    if complet or not config.LLM_SELECTION_READ_FACTOR:
+        # Document entier : cache des textes et extraction parallèle des gros PDF
+        sha256, pages = extraire_pages(fichier)
+        return sha256, pages, len(pages)
+    max_caracteres = max(
+        int(budget * config.LLM_CHARS_PER_TOKEN.get(provider_type, 4.0) * config.LLM_SELECTION_READ_FACTOR),
+        config.SIMILARITE_PREFIXE_CARACTERES
+    )
+    return extraire_debut(fichier, max_caracteres)
+
+
+def _analyser_lot(user, projets_antecedents, fichiers):
+    """Préqualifie plusieurs appels d'offres en une passe et sauvegarde chaque analyse"""
+    manager = get_llm_manager()
+    budget, provider_type = manager.input_budget(task="prequalification")
+    today_str = datetime.today().strftime("%Y-%m-%d")
+    
+    elements, documents = [], []
+    with st.spinner(f"📄 Lecture de {len(fichiers)} PDF..."):
+        for fichier in fichiers:
+            sha256, pages, nb_pages = _lire_appel_offres(fichier, budget, provider_type)
+            pages_normalisees, normalisation = normaliser_pages(pages, provider_type)
+            texte, brut = joindre_pages(pages_normalisees), joindre_pages(pages)
+            # Texte brut : les dates de l'en-tête répété restent repérables
+            faits = extraire_faits(brut)
+            if not texte.strip():
+                st.warning(f"⚠️ {fichier.name} : texte illisible, document ignoré")
+                continue
+            prefixe, suffixe, _ = construire_prompt_analyse(
+                user, projets_antecedents, texte, today_str, budget, provider_type, faits=faits
+            )
+            elements.append({"prompt": suffixe, "prefix": prefixe, "task": "prequalification"})
+            documents.append((fichier, calculer_empreinte(brut), sha256, pages if len(pages) == nb_pages else None,
+                              normalisation, faits))
+    if not elements:
+        return
+    
+    progression = st.progress(0.0, text=f"0/{len(elements)} analyses terminées")
+    lot = manager.analyze_many(
+        elements,
+        on_progress=lambda termines, total: progression.progress(
+            termines / total, text=f"{termines}/{total} analyses terminées"
+        )
+    )
+    
+    lignes = []
+    for (fichier, empreinte, sha256, pages, normalisation, faits), response in zip(documents, lot["results"]):
+        nom_projet = fichier.name.rsplit(".", 1)[0]
+        if not response["success"]:
+            lignes.append({"Document": fichier.name, "Recommandation": "ERREUR", "Score": None,
+                           "Tokens économisés": normalisation["tokens_economises"], "Détail": response["error"]})
+            continue
+        rec, score = _interpreter_resultat(response["result"])
+        fichier.seek(0)
+        soumission = database.save_soumission(user['id'], {
+            "numero_projet": "",
+            "nom_projet": nom_projet,
+            "document": fichier,
+            "analyse_json": dict(
+                {"raw_response": response["result"], "empreinte": empreinte,
+                 "normalisation": normalisation, "faits": faits},
+                **champs_soumission(sha256, pages)
+            ),
+            "recommendation": rec,
+            "score": score,
+            "statut": "qualifie" if rec == "GO" else "non_qualifie"
+        })
+        lignes.append({"Document": fichier.name, "Recommandation": rec, "Score": score,
+                       "Tokens économisés": normalisation["tokens_economises"],
+                       "Détail": "Sauvegardée" if soumission else "Non sauvegardée"})
+    
+    stats = lot["stats"]
+    st.dataframe(lignes, use_container_width=True)
+    st.caption(
+        f"{stats['succeeded']}/{stats['items']} analyses réussies en {stats['seconds']:.0f} s "
+        f"({stats['items_per_minute'] or 0:.1f} appels d'offres/min, {stats['concurrency']} en parallèle)"
+    )
+
+
+def show_analyse_tab(user, projets_antecedents):
+    """Affiche l'onglet d'analyse"""
+    st.header("🔍 Lancer une préqualification")
+    
+    with st.form("analyse_form"):
+        numero_projet = st.text_input("🔢 Numéro du projet")
+        nom_projet = st.text_input("📋 Nom du projet")
+        uploaded_file = st.file_uploader("📄 PDF Appel d'offre", type=['pdf'])
+        par_parties = st.checkbox(
+            "🧩 Couvrir tout le document (analyse par parties si le document est trop long)",
+            value=config.LLM_MAP_REDUCE_ENABLED
+        )
+        submit = st.form_submit_button("🚀 Lancer l'analyse", use_container_width=False)
+    
+    if submit and uploaded_file:
+        if not nom_projet:
+            st.error("❌ Le nom du projet est obligatoire")
+        else:
+            try:
+                budget, provider_type = get_llm_manager().input_budget(task="prequalification")
+                with st.spinner("📄 Lecture du PDF..."):
+                    sha256, pages, nb_pages = _lire_appel_offres(
+                        uploaded_file, budget, provider_type, complet=par_parties
+                    )
+                    pages_normalisees, normalisation = normaliser_pages(pages, provider_type)
+                    text = joindre_pages(pages_normalisees)
                 
-                except Exception as e:
-                    st.error(f"❌ Erreur lors de l'analyse : {str(e)}")
+                if not text.strip():
+                    st.error("❌ Le PDF semble vide ou le texte n'a pas pu être extrait")
+                    st.stop()
+                if len(pages) < nb_pages:
+                    st.caption(f"📄 {len(pages)} pages sur {nb_pages} lues : la suite dépasse la limite du modèle")
+                if config.TEXTE_NORMALISATION_ENABLED:
+                    st.caption(resume_normalisation(normalisation))
+                
+                brut = joindre_pages(pages)
+                empreinte = calculer_empreinte(brut)
+                faits = extraire_faits(brut)
+                doublon = trouver_doublon(
+                    empreinte,
+                    database.get_empreintes_soumissions(user['id'], config.SIMILARITE_MAX_CANDIDATS)
+                )
+                if doublon:
+                    # Hachages de lignes chargés pour la seule soumission retenue
+                    doublon[0]["empreinte"] = (
+                        database.get_empreinte_soumission(doublon[0]["id"]) or doublon[0]["empreinte"]
+                    )
+                st.session_state.analyse_en_attente = {
+                    "numero_projet": numero_projet,
+                    "nom_projet": nom_projet,
+                    "document": uploaded_file,
+                    "texte": text,
+                    "sha256": sha256,
+                    "pages": pages if len(pages) == nb_pages else None,
+                    "pages_normalisees": pages_normalisees,
+                    "normalisation": normalisation,
+                    "empreinte": empreinte,
+                    "faits": faits,
+                    "doublon": doublon,
+                    "par_parties": par_parties
+                }
+                if doublon is None:
+                    _executer_analyse(user, projets_antecedents, st.session_state.analyse_en_attente)
+            
+            except Exception as e:
+                st.error(f"❌ Erreur lors de l'analyse : {str(e)}")
     elif submit:
         st.error("❌ Veuillez uploader un fichier PDF")
+    
+    attente = st.session_state.get("analyse_en_attente")
+    if attente and attente["doublon"]:
+        _proposer_reprise(user, projets_antecedents, attente)
+    
+    with st.expander("📚 Analyse en lot (plusieurs appels d'offres)"):
+        with st.form("analyse_lot_form"):
+            fichiers = st.file_uploader("📄 PDF des appels d'offres", type=['pdf'], accept_multiple_files=True)
+            lancer_lot = st.form_submit_button("🚀 Analyser le lot", use_container_width=False)
+        
+        if lancer_lot and fichiers:
+            try:
+                _analyser_lot(user, projets_antecedents, fichiers)
+            except Exception as e:
+                st.error(f"❌ Erreur lors de l'analyse en lot : {str(e)}")
+        elif lancer_lot:
+            st.error("❌ Veuillez uploader au moins un fichier PDF")
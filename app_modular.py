@@ -14,6 +14,7 @@ import projets
 import offres
 import generateur_offres
 import gestion_projets
+import metriques
 
 # Configuration de la page
 st.set_page_config(
@@ -116,7 +117,7 @@ else:
         projets_antecedents = []
 
     # ONGLETS PRINCIPAUX — Mes Offres ajoutee entre Generateur d'Offres et Gestion de Projet
-    tab1, tab2, tab3, tab4, tab5, tab6, tab7 = st.tabs([
+    tab1, tab2, tab3, tab4, tab5, tab6, tab7, *tab_admin = st.tabs([
         "Tableau de bord",
         "Nouvelle analyse",
         "Generateur d'Offres",
@@ -124,7 +125,7 @@ else:
         "Gestion de Projet",
         "Projets anterieurs",
         "Mon profil"
-    ])
+    ] + (["Exploitation"] if metriques.est_admin(user) else []))
 
     with tab1:
         dashboard.show_dashboard(user)
@@ -161,3 +162,7 @@ else:
 
     with tab7:
         profile.show_profile_tab(user)
+
+    if tab_admin:
+        with tab_admin[0]:
+            metriques.show_metriques_tab()
@@ -0,0 +1,137 @@
+"""
+Benchmark : coût d'établissement de connexion par appel Groq
+
+Compare un `requests.post` nu (nouvelle connexion à chaque appel) à la
+session keep-alive de LLMManager, contre un serveur local qui imite
+l'API chat/completions de Groq. Aucun accès réseau ni clé API requis.
+
+Usage :
+    python benchmarks/bench_connexions_groq.py --appels 200
+    python benchmarks/bench_connexions_groq.py --certfile cert.pem --keyfile key.pem   # avec TLS
+"""
+import argparse
+import json
+import os
+import socket
+import ssl
+import statistics
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import requests
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from llm_manager import build_http_session  # noqa: E402
+
+
+class FakeGroqHandler(BaseHTTPRequestHandler):
+    """Répond comme /openai/v1/chat/completions, en HTTP/1.1 keep-alive"""
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # Sans TCP_NODELAY, Nagle + ACK retardé ajoutent ~40 ms aux connexions réutilisées
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.server.lock:
+            self.server.connexions += 1
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        time.sleep(self.server.latence)
+        payload = json.dumps({
+            "choices": [{"message": {"content": f"ok ({len(body.get('messages', []))} message)"}}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 3}
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def demarrer_serveur(latence: float, certfile: str = None, keyfile: str = None):
+    serveur = ThreadingHTTPServer(("127.0.0.1", 0), FakeGroqHandler)
+    serveur.daemon_threads = True
+    serveur.latence = latence
+    serveur.connexions = 0
+    serveur.lock = threading.Lock()
+    schema = "http"
+    if certfile:
+        contexte = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        contexte.load_cert_chain(certfile, keyfile)
+        serveur.socket = contexte.wrap_socket(serveur.socket, server_side=True)
+        schema = "https"
+    threading.Thread(target=serveur.serve_forever, daemon=True).start()
+    return serveur, f"{schema}://127.0.0.1:{serveur.server_port}/openai/v1/chat/completions"
+
+
+def mesurer(post, url: str, appels: int) -> list:
+    payload = {
+        "model": "llama-3.3-70b-versatile",
+        "messages": [{"role": "user", "content": "Bonjour"}],
+        "max_tokens": 16,
+        "temperature": 0.3
+    }
+    durees = []
+    for _ in range(appels):
+        debut = time.perf_counter()
+        response = post(url, headers={"Authorization": "Bearer bench"}, json=payload, timeout=30)
+        response.raise_for_status()
+        response.json()
+        durees.append((time.perf_counter() - debut) * 1000)
+    return durees
+
+
+def resume(nom: str, durees: list, connexions: int) -> dict:
+    durees_triees = sorted(durees)
+    return {
+        "mode": nom,
+        "appels": len(durees),
+        "connexions": connexions,
+        "moyenne_ms": round(statistics.mean(durees), 3),
+        "p50_ms": round(statistics.median(durees), 3),
+        "p95_ms": round(durees_triees[int(len(durees_triees) * 0.95) - 1], 3)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--appels", type=int, default=200)
+    parser.add_argument("--latence-serveur", type=float, default=0.0, help="secondes ajoutées par réponse")
+    parser.add_argument("--certfile")
+    parser.add_argument("--keyfile")
+    args = parser.parse_args()
+
+    serveur, url = demarrer_serveur(args.latence_serveur, args.certfile, args.keyfile)
+    verify = not args.certfile
+
+    session = build_http_session(http2=False)
+
+    def post_nu(*a, **kw):
+        return requests.post(*a, verify=verify, **kw)
+
+    def post_session(*a, **kw):
+        return session.post(*a, verify=verify, **kw)
+
+    resultats = []
+    for nom, post in [("requests.post (sans pool)", post_nu), ("session keep-alive", post_session)]:
+        mesurer(post, url, 3)  # préchauffage
+        avant = serveur.connexions
+        durees = mesurer(post, url, args.appels)
+        resultats.append(resume(nom, durees, serveur.connexions - avant))
+
+    for r in resultats:
+        print(json.dumps(r, ensure_ascii=False))
+    gain = resultats[0]["moyenne_ms"] - resultats[1]["moyenne_ms"]
+    print(f"Coût d'établissement de connexion évité par appel : {gain:.3f} ms")
+    serveur.shutdown()
+
+
+if __name__ == "__main__":
+    main()
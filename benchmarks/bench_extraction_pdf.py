@@ -0,0 +1,115 @@
+"""
+Benchmark : extraction du texte d'un gros PDF, séquentielle ou parallèle
+
+Génère un dossier d'appel d'offres synthétique (500 pages de devis par
+défaut, flux compressés comme dans les PDF réels), puis compare
+l'extraction page par page dans le processus courant à l'extraction
+répartie sur un pool de processus. Vérifie que le texte réassemblé est
+identique, dans l'ordre des pages. Le cache des textes n'intervient pas.
+
+Usage :
+    python benchmarks/bench_extraction_pdf.py
+    python benchmarks/bench_extraction_pdf.py --pages 300 --workers 4 --repetitions 5
+"""
+import argparse
+import io
+import json
+import os
+import statistics
+import sys
+import time
+import zlib
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pypdf import PdfReader  # noqa: E402
+import extraction_pdf  # noqa: E402
+
+LIGNES_PAR_PAGE = 45
+MOTS = (
+    "devis section travaux entrepreneur fourniture installation membrane toiture isolant pare-vapeur "
+    "solin drain conformément plans addenda garantie exigences RBQ cautionnement soumission clôture "
+    "visite chantier échéancier livrables inspection essais conformité matériaux béton acier"
+).split()
+
+
+def _ligne(page: int, numero: int) -> str:
+    mots = [MOTS[(page * 7 + numero * 3 + i) % len(MOTS)] for i in range(12)]
+    return f"{page + 1}.{numero + 1} " + " ".join(mots)
+
+
+def pdf_synthetique(nb_pages: int) -> bytes:
+    """PDF minimal valide : une police standard et un flux de texte compressé par page"""
+    objets = [b"<< /Type /Catalog /Pages 2 0 R >>", b"", b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    pages = []
+    for page in range(nb_pages):
+        lignes = "".join(f"({_ligne(page, n)}) Tj T* " for n in range(LIGNES_PAR_PAGE))
+        flux = zlib.compress(f"BT /F1 9 Tf 11 TL 40 760 Td {lignes}ET".encode("latin-1"))
+        objets.append(b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(flux) + flux + b"\nendstream")
+        objets.append((
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objets)} 0 R >>"
+        ).encode())
+        pages.append(len(objets))
+    objets[1] = (
+        f"<< /Type /Pages /Kids [{' '.join(f'{p} 0 R' for p in pages)}] /Count {len(pages)} >>"
+    ).encode()
+
+    sortie = io.BytesIO()
+    sortie.write(b"%PDF-1.4\n")
+    positions = []
+    for numero, objet in enumerate(objets, 1):
+        positions.append(sortie.tell())
+        sortie.write(b"%d 0 obj\n" % numero + objet + b"\nendobj\n")
+    xref = sortie.tell()
+    sortie.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objets) + 1))
+    sortie.write("".join(f"{p:010d} 00000 n \n" for p in positions).encode())
+    sortie.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objets) + 1, xref))
+    return sortie.getvalue()
+
+
+def sequentielle(data: bytes) -> list:
+    return [page.extract_text() or "" for page in PdfReader(io.BytesIO(data)).pages]
+
+
+def mesurer(fonction, repetitions: int) -> tuple:
+    durees, resultat = [], None
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        resultat = fonction()
+        durees.append(time.perf_counter() - debut)
+    return durees, resultat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--repetitions", type=int, default=3)
+    args = parser.parse_args()
+
+    extraction_pdf.config.PDF_PARALLEL_WORKERS = args.workers
+    data = pdf_synthetique(args.pages)
+    print(f"PDF synthétique : {args.pages} pages, {len(data) / 1024:.0f} Kio, {args.workers} processus")
+
+    # Démarrage du pool hors mesure (coût unique par processus Streamlit)
+    extraction_pdf.extraire_pages_paralleles(pdf_synthetique(2), 2, args.workers)
+
+    durees_seq, texte_seq = mesurer(lambda: sequentielle(data), args.repetitions)
+    durees_par, texte_par = mesurer(
+        lambda: extraction_pdf.extraire_pages_paralleles(data, args.pages, args.workers), args.repetitions
+    )
+    if texte_par != texte_seq:
+        sys.exit("❌ Le texte extrait en parallèle diffère de l'extraction séquentielle")
+
+    for mode, durees in (("sequentielle", durees_seq), ("parallele", durees_par)):
+        print(json.dumps({
+            "mode": mode,
+            "median_s": round(statistics.median(durees), 3),
+            "min_s": round(min(durees), 3),
+            "pages_par_seconde": round(args.pages / statistics.median(durees), 1)
+        }, ensure_ascii=False))
+    print(f"Accélération : x{statistics.median(durees_seq) / statistics.median(durees_par):.2f} (texte identique)")
+
+
+if __name__ == "__main__":
+    main()
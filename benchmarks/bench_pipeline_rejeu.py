@@ -0,0 +1,135 @@
+"""
+Benchmark : pipeline analyse → exigences → offre technique en rejeu hors ligne
+
+Rejoue des réponses enregistrées (LLM_REPLAY_MODE=replay) avec une latence
+et un taux d'échec injectés, puis affiche les durées par étape et la
+télémétrie par tâche. Aucun accès réseau ni clé API requis.
+
+Usage :
+    python benchmarks/bench_pipeline_rejeu.py --generer --iterations 50 --latence 0.8 --gigue 0.4
+    python benchmarks/bench_pipeline_rejeu.py --fixtures benchmarks/fixtures/llm --taux-echec 0.05
+
+Pour enregistrer de vraies réponses : lancer l'application avec
+LLM_REPLAY_MODE=record (et les clés API), puis rejouer le même répertoire.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import config  # noqa: E402
+
+ETAPES = [
+    ("prequalification", False, 2500),
+    ("exigences", True, 2000),
+    ("offre_technique", True, 3000)
+]
+
+
+def prompt_synthetique(tache: str, numero: int) -> str:
+    return f"[{tache}] Appel d'offres synthétique n° {numero} : réfection de toiture, 1200 m², clôture dans 15 jours."
+
+
+def reponse_synthetique(tache: str, numero: int) -> str:
+    if tache == "prequalification":
+        return (
+            f"Analyse de l'appel d'offres n° {numero}.\n" + "Point analysé. " * 150
+            + "\nJe recommande GO.\nSCORE : 72/100"
+        )
+    if tache == "exigences":
+        return json.dumps({
+            "numero_projet": f"AO-{numero}",
+            "nom_projet": "Réfection de toiture",
+            "livrables": ["Plans", "Rapport final"],
+            "exigences_techniques": ["Licence RBQ", "Membrane élastomère"]
+        }, ensure_ascii=False)
+    return json.dumps({
+        "titre_offre": f"Offre AO-{numero}",
+        "approche_methodologique": {"description": "Approche", "phases": [
+            {"nom": "Phase 1", "description": "Préparation", "duree": "5 jours"}
+        ]}
+    }, ensure_ascii=False)
+
+
+def generer_fixtures(manager, store, variantes: int):
+    """Écrit des réponses synthétiques pour chaque étape et chaque variante de prompt"""
+    for numero in range(variantes):
+        for tache, json_mode, max_tokens in ETAPES:
+            request = manager._build_request(prompt_synthetique(tache, numero), max_tokens, json_mode, task=tache)
+            resultat = reponse_synthetique(tache, numero)
+            store.save(
+                request,
+                {"name": "Synthétique", "model": "llama-3.3-70b-versatile"},
+                resultat,
+                {"input_tokens": len(request["prompt"]) // 4 + 1500, "output_tokens": len(resultat) // 4}
+            )
+
+
+def percentile(valeurs: list, p: float) -> float:
+    triees = sorted(valeurs)
+    return triees[max(0, int(round(len(triees) * p)) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--fixtures", help="répertoire des réponses enregistrées (défaut : temporaire)")
+    parser.add_argument("--generer", action="store_true", help="écrit d'abord des réponses synthétiques")
+    parser.add_argument("--variantes", type=int, default=5, help="nombre de prompts distincts par étape")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--latence", type=float, default=0.0, help="secondes injectées par appel")
+    parser.add_argument("--gigue", type=float, default=0.0, help="gigue aléatoire maximale (secondes)")
+    parser.add_argument("--taux-echec", type=float, default=0.0, help="proportion d'appels en échec simulé")
+    parser.add_argument("--graine", type=int, default=42)
+    args = parser.parse_args()
+
+    config.LLM_REPLAY_MODE = "replay"
+    config.LLM_REPLAY_DIR = args.fixtures or tempfile.mkdtemp(prefix="llm_rejeu_")
+    config.LLM_REPLAY_LATENCY_SECONDS = args.latence
+    config.LLM_REPLAY_JITTER_SECONDS = args.gigue
+    config.LLM_REPLAY_FAILURE_RATE = args.taux_echec
+    config.LLM_REPLAY_SEED = args.graine
+    config.LLM_CACHE_ENABLED = False
+    # Les pannes simulées ne doivent pas ouvrir le disjoncteur pendant la mesure
+    config.LLM_BREAKER_FAILURE_THRESHOLD = 10 ** 9
+
+    from llm_manager import LLMManager
+    from llm_replay import FixtureStore
+
+    manager = LLMManager()
+    if args.generer or not args.fixtures:
+        generer_fixtures(manager, FixtureStore(config.LLM_REPLAY_DIR), args.variantes)
+
+    durees = {tache: [] for tache, _, _ in ETAPES}
+    echecs = {tache: 0 for tache, _, _ in ETAPES}
+    debut_total = time.perf_counter()
+    for iteration in range(args.iterations):
+        numero = iteration % args.variantes
+        for tache, json_mode, max_tokens in ETAPES:
+            analyser = manager.analyze_json if json_mode else manager.analyze
+            debut = time.perf_counter()
+            resultat = analyser(prompt_synthetique(tache, numero), max_tokens=max_tokens, task=tache)
+            durees[tache].append((time.perf_counter() - debut) * 1000)
+            if not resultat["success"]:
+                echecs[tache] += 1
+    duree_totale = time.perf_counter() - debut_total
+
+    for tache, valeurs in durees.items():
+        print(json.dumps({
+            "etape": tache,
+            "appels": len(valeurs),
+            "echecs": echecs[tache],
+            "p50_ms": round(statistics.median(valeurs), 3),
+            "p95_ms": round(percentile(valeurs, 0.95), 3),
+            "max_ms": round(max(valeurs), 3)
+        }, ensure_ascii=False))
+    print(f"Pipelines complets par seconde : {args.iterations / duree_totale:.2f}")
+    for ligne in manager.telemetry_summary():
+        print(json.dumps(ligne, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
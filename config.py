@@ -15,6 +15,205 @@ SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
 # Configuration LLM
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+GROQ_API_URL = os.getenv("GROQ_API_URL", "https://api.groq.com/openai/v1/chat/completions")
+ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
+
+# Cache des réponses LLM (SQLite)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".cache/llm_reponses.sqlite3")
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "500"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+# Cache du texte extrait des PDF (SQLite, indexé par le SHA-256 du fichier) ;
+# PDF_TEXT_STORE_IN_SOUMISSION copie aussi le texte des pages dans analyse_json
+PDF_TEXT_CACHE_ENABLED = os.getenv("PDF_TEXT_CACHE_ENABLED", "true").lower() == "true"
+PDF_TEXT_CACHE_PATH = os.getenv("PDF_TEXT_CACHE_PATH", ".cache/textes_pdf.sqlite3")
+PDF_TEXT_CACHE_MAX_ENTRIES = int(os.getenv("PDF_TEXT_CACHE_MAX_ENTRIES", "200"))
+PDF_TEXT_CACHE_MAX_BYTES = int(os.getenv("PDF_TEXT_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+PDF_TEXT_STORE_IN_SOUMISSION = os.getenv("PDF_TEXT_STORE_IN_SOUMISSION", "false").lower() == "true"
+# Extraction parallèle (pool de processus) des PDF d'au moins PDF_PARALLEL_MIN_PAGES pages ;
+# PDF_PARALLEL_WORKERS=0 : un processus par cœur
+PDF_PARALLEL_ENABLED = os.getenv("PDF_PARALLEL_ENABLED", "true").lower() == "true"
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "80"))
+PDF_PARALLEL_WORKERS = int(os.getenv("PDF_PARALLEL_WORKERS", "0"))
+
+# Délais et requêtes parallèles différées (« hedged »)
+LLM_GEMINI_TIMEOUT_SECONDS = float(os.getenv("LLM_GEMINI_TIMEOUT_SECONDS", "60"))
+LLM_ANTHROPIC_TIMEOUT_SECONDS = float(os.getenv("LLM_ANTHROPIC_TIMEOUT_SECONDS", "60"))
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+LLM_HEDGE_DELAY_SECONDS = float(os.getenv("LLM_HEDGE_DELAY_SECONDS", "8"))
+LLM_HEDGE_MAX_WORKERS = int(os.getenv("LLM_HEDGE_MAX_WORKERS", "8"))
+
+# Disjoncteur et classement des fournisseurs selon leur santé
+LLM_BREAKER_FAILURE_THRESHOLD = int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", "3"))
+LLM_BREAKER_COOLDOWN_SECONDS = float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "60"))
+LLM_HEALTH_WINDOW = int(os.getenv("LLM_HEALTH_WINDOW", "50"))
+LLM_HEALTH_MAX_AGE_SECONDS = float(os.getenv("LLM_HEALTH_MAX_AGE_SECONDS", "300"))
+# Appels récents nécessaires avant qu'un fournisseur soit reclassé selon ses mesures
+LLM_HEALTH_MIN_SAMPLES = int(os.getenv("LLM_HEALTH_MIN_SAMPLES", "5"))
+
+# Quotas par fournisseur (requêtes/min et tokens/min) et file d'attente partagée.
+# Défauts des offres gratuites (Groq : llama-3.3-70b-versatile) ; à relever selon le palier du compte
+LLM_RATE_LIMITS = {
+    "gemini": {
+        "rpm": int(os.getenv("GEMINI_RPM", "15")),
+        "tpm": int(os.getenv("GEMINI_TPM", "1000000"))
+    },
+    "groq": {
+        "rpm": int(os.getenv("GROQ_RPM", "30")),
+        "tpm": int(os.getenv("GROQ_TPM", "12000"))
+    },
+    "anthropic": {
+        "rpm": int(os.getenv("ANTHROPIC_RPM", "50")),
+        "tpm": int(os.getenv("ANTHROPIC_TPM", "30000"))
+    },
+    "replay": {
+        "rpm": int(os.getenv("REPLAY_RPM", "100000")),
+        "tpm": int(os.getenv("REPLAY_TPM", "1000000000"))
+    }
+}
+LLM_RATE_LIMIT_MAX_QUEUE = int(os.getenv("LLM_RATE_LIMIT_MAX_QUEUE", "20"))
+LLM_RATE_LIMIT_MAX_WAIT_SECONDS = float(os.getenv("LLM_RATE_LIMIT_MAX_WAIT_SECONDS", "30"))
+LLM_RETRY_AFTER_DEFAULT_SECONDS = float(os.getenv("LLM_RETRY_AFTER_DEFAULT_SECONDS", "10"))
+
+# Pools de connexions HTTP (keep-alive) et appels asynchrones
+LLM_HTTP_POOL_SIZE = int(os.getenv("LLM_HTTP_POOL_SIZE", "20"))
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "false").lower() == "true"
+LLM_ASYNC_CONCURRENCY = int(os.getenv("LLM_ASYNC_CONCURRENCY", "5"))
+# Attente maximale dans la file d'un limiteur pendant une analyse en lot (au lieu de LLM_RATE_LIMIT_MAX_WAIT_SECONDS)
+LLM_BATCH_MAX_QUEUE_WAIT_SECONDS = float(os.getenv("LLM_BATCH_MAX_QUEUE_WAIT_SECONDS", "300"))
+
+# Regroupement des appels identiques en cours (un seul appel, réponse partagée)
+LLM_SINGLEFLIGHT_ENABLED = os.getenv("LLM_SINGLEFLIGHT_ENABLED", "true").lower() == "true"
+
+# Télémétrie des appels LLM (tampon circulaire en mémoire) et tarifs en $ US par million de tokens
+LLM_TELEMETRY_BUFFER_SIZE = int(os.getenv("LLM_TELEMETRY_BUFFER_SIZE", "1000"))
+LLM_PRICING = {
+    "gemini-2.0-flash-exp": {"input": 0.10, "cached_input": 0.025, "output": 0.40},
+    "gemini-2.0-flash-lite": {"input": 0.075, "output": 0.30},
+    "llama-3.3-70b-versatile": {"input": 0.59, "output": 0.79},
+    "llama-3.1-8b-instant": {"input": 0.05, "output": 0.08},
+    "claude-sonnet-4-20250514": {"input": 3.00, "cached_input": 0.30, "output": 15.00}
+}
+
+# Budget de tokens des prompts : fenêtre de contexte par modèle, caractères par token
+# selon le tokenizer du fournisseur, marge de sécurité et plafond d'entrée (maîtrise des coûts)
+LLM_CONTEXT_WINDOWS = {
+    "gemini-2.0-flash-exp": 1_048_576,
+    "gemini-2.0-flash-lite": 1_048_576,
+    "llama-3.3-70b-versatile": 131_072,
+    "llama-3.1-8b-instant": 131_072,
+    "claude-sonnet-4-20250514": 200_000,
+    "replay": 131_072
+}
+LLM_CHARS_PER_TOKEN = {"gemini": 4.0, "groq": 3.5, "anthropic": 3.5, "replay": 4.0}
+LLM_PROMPT_SAFETY_MARGIN_TOKENS = int(os.getenv("LLM_PROMPT_SAFETY_MARGIN_TOKENS", "256"))
+# Plafond d'entrée d'un prompt : le texte au-delà est résumé (passages pertinents, analyse par parties)
+# plutôt qu'envoyé en entier au modèle de 1 M de tokens
+LLM_PROMPT_MAX_INPUT_TOKENS = int(os.getenv("LLM_PROMPT_MAX_INPUT_TOKENS", "24000"))
+# Préqualification : texte lu au plus N fois le budget du prompt, pour y choisir les passages
+# pertinents d'un long document (0 : document entier)
+LLM_SELECTION_READ_FACTOR = float(os.getenv("LLM_SELECTION_READ_FACTOR", "5"))
+# Normalisation du texte extrait avant les prompts : lignes répétées en haut ou en bas d'au moins
+# TEXTE_REPETITION_MIN_SHARE des pages (et TEXTE_REPETITION_MIN_PAGES pages) retirées, parmi les
+# TEXTE_LIGNES_BORDURE premières et dernières lignes de chaque page
+TEXTE_NORMALISATION_ENABLED = os.getenv("TEXTE_NORMALISATION_ENABLED", "true").lower() == "true"
+TEXTE_REPETITION_MIN_SHARE = float(os.getenv("TEXTE_REPETITION_MIN_SHARE", "0.3"))
+TEXTE_REPETITION_MIN_PAGES = int(os.getenv("TEXTE_REPETITION_MIN_PAGES", "3"))
+TEXTE_LIGNES_BORDURE = int(os.getenv("TEXTE_LIGNES_BORDURE", "4"))
+# Dates et montants extraits localement avant l'analyse : les jours fériés du Québec sont exclus
+# des délais en jours ouvrables (en plus des fins de semaine)
+FAITS_JOURS_FERIES_QUEBEC = os.getenv("FAITS_JOURS_FERIES_QUEBEC", "true").lower() == "true"
+# Analyse par parties (map-reduce) des documents qui dépassent le budget : extraction compacte
+# de chaque bloc en parallèle, puis un appel final de synthèse. Taille maximale d'un bloc en
+# tokens et nombre de blocs traités simultanément. Désactivée par défaut (case à cocher dans
+# l'onglet d'analyse) : elle lit tout le PDF et multiplie les appels sur les longs documents,
+# alors que la lecture partielle et la sélection BM25 des passages suffisent en général
+LLM_MAP_REDUCE_ENABLED = os.getenv("LLM_MAP_REDUCE_ENABLED", "false").lower() == "true"
+LLM_MAP_REDUCE_BLOCK_TOKENS = int(os.getenv("LLM_MAP_REDUCE_BLOCK_TOKENS", "8000"))
+LLM_MAP_REDUCE_CONCURRENCY = int(os.getenv("LLM_MAP_REDUCE_CONCURRENCY", "8"))
+
+# Noms affichés des modèles (un fournisseur, avec son disjoncteur et son quota, par modèle)
+LLM_MODEL_NAMES = {
+    "gemini-2.0-flash-exp": "Gemini 2.0 Flash",
+    "gemini-2.0-flash-lite": "Gemini 2.0 Flash-Lite",
+    "llama-3.3-70b-versatile": "Groq LLaMA 3.3 70B",
+    "llama-3.1-8b-instant": "Groq LLaMA 3.1 8B",
+    "claude-sonnet-4-20250514": "Claude Sonnet 4"
+}
+
+
+def _task_route(task: str, chain: str, max_tokens: int, timeout: float) -> dict:
+    """Route d'une tâche, surchargeable par LLM_ROUTE_<TÂCHE>[_MAX_TOKENS|_TIMEOUT_SECONDS]"""
+    prefix = f"LLM_ROUTE_{task.upper()}"
+    return {
+        "chain": [
+            tuple(maillon.strip().split(":", 1))
+            for maillon in os.getenv(prefix, chain).split(",") if ":" in maillon
+        ],
+        "max_tokens": int(os.getenv(f"{prefix}_MAX_TOKENS", str(max_tokens))),
+        "timeout": float(os.getenv(f"{prefix}_TIMEOUT_SECONDS", str(timeout)))
+    }
+
+
+# Routage par tâche : chaîne de repli "type:modèle" (dans l'ordre, les fournisseurs sans clé
+# sont ignorés), tokens de sortie et délai par appel. Les autres tâches utilisent tous les
+# fournisseurs configurés, classés selon leur santé.
+LLM_TASK_ROUTES = {
+    "prequalification": _task_route(
+        "prequalification",
+        "gemini:gemini-2.0-flash-exp,anthropic:claude-sonnet-4-20250514,groq:llama-3.3-70b-versatile",
+        2500, 90
+    ),
+    "exigences": _task_route(
+        "exigences",
+        "gemini:gemini-2.0-flash-lite,groq:llama-3.1-8b-instant,gemini:gemini-2.0-flash-exp",
+        2000, 30
+    ),
+    "extraction_bloc": _task_route(
+        "extraction_bloc",
+        "gemini:gemini-2.0-flash-lite,groq:llama-3.1-8b-instant,gemini:gemini-2.0-flash-exp",
+        800, 30
+    ),
+    "offre_technique": _task_route(
+        "offre_technique",
+        "gemini:gemini-2.0-flash-exp,anthropic:claude-sonnet-4-20250514,groq:llama-3.3-70b-versatile",
+        3000, 90
+    ),
+    "demarrage": _task_route(
+        "demarrage",
+        "anthropic:claude-sonnet-4-20250514,gemini:gemini-2.0-flash-exp,groq:llama-3.3-70b-versatile",
+        1500, 60
+    )
+}
+
+# Mise en cache des préfixes de prompt chez les fournisseurs (Anthropic : cache « ephemeral » de 5 min)
+LLM_PREFIX_CACHE_TTL_SECONDS = float(os.getenv("LLM_PREFIX_CACHE_TTL_SECONDS", "300"))
+
+# Fournisseur d'enregistrement/rejeu (benchmarks hors ligne) :
+# "off", "record" (enregistre les vraies réponses) ou "replay" (les rejoue, sans clé ni réseau)
+LLM_REPLAY_MODE = os.getenv("LLM_REPLAY_MODE", "off").lower()
+LLM_REPLAY_DIR = os.getenv("LLM_REPLAY_DIR", "benchmarks/fixtures/llm")
+LLM_REPLAY_LATENCY_SECONDS = float(os.getenv("LLM_REPLAY_LATENCY_SECONDS", "0"))
+LLM_REPLAY_JITTER_SECONDS = float(os.getenv("LLM_REPLAY_JITTER_SECONDS", "0"))
+LLM_REPLAY_FAILURE_RATE = float(os.getenv("LLM_REPLAY_FAILURE_RATE", "0"))
+LLM_REPLAY_SEED = os.getenv("LLM_REPLAY_SEED")
+
+# Détection des appels d'offres réémis : similarité minimale pour proposer l'analyse
+# précédente ou une analyse différentielle, taille de la signature MinHash et nombre
+# de soumissions récentes comparées. La signature porte sur le début du texte brut
+# (même étendue quel que soit le mode d'analyse, toujours lue)
+SIMILARITE_SEUIL = float(os.getenv("SIMILARITE_SEUIL", "0.8"))
+SIMILARITE_TAILLE_SIGNATURE = int(os.getenv("SIMILARITE_TAILLE_SIGNATURE", "128"))
+SIMILARITE_MAX_CANDIDATS = int(os.getenv("SIMILARITE_MAX_CANDIDATS", "200"))
+SIMILARITE_PREFIXE_CARACTERES = int(os.getenv("SIMILARITE_PREFIXE_CARACTERES", "50000"))
+
+# Comptes (courriels séparés par des virgules) qui voient l'onglet « Exploitation » :
+# télémétrie LLM, caches, santé et quotas des fournisseurs
+ADMIN_EMAILS = {
+    courriel.strip().lower() for courriel in os.getenv("ADMIN_EMAILS", "").split(",") if courriel.strip()
+}
 
 # URLs
 MOKAFAD_LOGO_URL = "https://unhbihdenqzokxiednos.supabase.co/storage/v1/object/public/logos/logo-mokafad.png"
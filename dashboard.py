@@ -425,7 +425,9 @@ def show_dashboard(user):
     with col_a:
         rows_html = ""
         try:
-            recent = database.supabase.table('soumissions').select("*").eq(
+            recent = database.supabase.table('soumissions').select(
+                "recommendation, nom_projet, score, created_at"
+            ).eq(
                 'entreprise_id', uid
             ).order('created_at', desc=True).limit(6).execute()
 
@@ -279,4 +279,64 @@ def save_soumission(entreprise_id, soumission_data):
             
     except Exception as e:
         st.error(f"❌ Erreur lors de la sauvegarde : {str(e)}")
-        return None
\ No newline at end of file
+        return None
+
+
+def get_empreintes_soumissions(entreprise_id, limite=200):
+    """
+    Signatures MinHash des dernières soumissions analysées (détection des appels
+    d'offres réémis). Seules la signature et sa version sont lues ; les hachages
+    de lignes de la soumission retenue se chargent avec get_empreinte_soumission.
+    """
+    try:
+        apply_supabase_auth()
+        result = supabase.table('soumissions').select(
+            "id, numero_projet, nom_projet, created_at, recommendation, score, "
+            "minhash:analyse_json->empreinte->minhash, version_empreinte:analyse_json->empreinte->version"
+        ).eq('entreprise_id', entreprise_id).order('created_at', desc=True).limit(limite).execute()
+        candidats = []
+        for row in result.data or []:
+            minhash, version = row.pop("minhash", None), row.pop("version_empreinte", None)
+            if minhash:
+                candidats.append(dict(row, empreinte={"version": version, "minhash": minhash}))
+        return candidats
+    except Exception as e:
+        st.warning(f"⚠️ Recherche des analyses précédentes impossible : {str(e)[:100]}")
+        return []
+
+
+def get_empreinte_soumission(soumission_id):
+    """Empreinte complète (signature et hachages de lignes) d'une soumission"""
+    try:
+        apply_supabase_auth()
+        result = supabase.table('soumissions').select(
+            "empreinte:analyse_json->empreinte"
+        ).eq('id', soumission_id).execute()
+        return result.data[0].get("empreinte") if result.data else None
+    except Exception as e:
+        st.warning(f"⚠️ Empreinte de la soumission introuvable : {str(e)[:100]}")
+        return None
+
+
+def get_pages_texte_soumission(soumission_id):
+    """Texte des pages conservé dans analyse_json (PDF_TEXT_STORE_IN_SOUMISSION), sinon None"""
+    try:
+        apply_supabase_auth()
+        result = supabase.table('soumissions').select(
+            "pages_texte:analyse_json->pages_texte"
+        ).eq('id', soumission_id).execute()
+        return result.data[0].get("pages_texte") if result.data else None
+    except Exception as e:
+        st.warning(f"⚠️ Texte de la soumission introuvable : {str(e)[:100]}")
+        return None
+
+
+def get_soumission(soumission_id):
+    """Récupère une soumission complète"""
+    try:
+        apply_supabase_auth()
+        result = supabase.table('soumissions').select("*").eq('id', soumission_id).execute()
+        return result.data[0] if result.data else None
+    except Exception as e:
+        st.warning(f"⚠️ Soumission introuvable : {str(e)[:100]}")
+        return None
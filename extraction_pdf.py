@@ -0,0 +1,310 @@
+"""
+Extraction du texte des PDF avec cache persistant (SQLite) adressé par contenu
+"""
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import closing
+import streamlit as st
+from pypdf import PdfReader
+import config
+
+# À incrémenter quand l'extraction change : les textes en cache sont alors ignorés
+EXTRACTEUR_VERSION = 1
+
+
+def lire_octets(fichier) -> bytes:
+    """Contenu d'un PDF : bytes, fichier Streamlit (UploadedFile) ou tout objet fichier"""
+    if isinstance(fichier, (bytes, bytearray)):
+        return bytes(fichier)
+    if hasattr(fichier, "getvalue"):
+        return fichier.getvalue()
+    fichier.seek(0)
+    return fichier.read()
+
+
+def hash_pdf(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class PdfTextCache:
+    """
+    Cache disque du texte extrait, page par page, indexé par le SHA-256
+    du PDF. Un même document n'est analysé par pypdf qu'une seule fois,
+    quel que soit l'onglet ou la session. Éviction LRU par nombre
+    d'entrées et taille totale.
+    """
+
+    def __init__(self, path: str, max_entries: int = 200, max_bytes: int = 200_000_000):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock, closing(self._connect()) as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS textes (
+                    sha256 TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL,
+                    pages TEXT NOT NULL,
+                    nb_pages INTEGER NOT NULL,
+                    taille INTEGER NOT NULL,
+                    cree_le REAL NOT NULL,
+                    dernier_acces REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_textes_acces ON textes (dernier_acces)")
+            conn.commit()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    def get(self, sha256: str):
+        """Texte des pages (liste) si le PDF a déjà été extrait par cette version, sinon None"""
+        with self._lock, closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT pages FROM textes WHERE sha256 = ? AND version = ?", (sha256, EXTRACTEUR_VERSION)
+            ).fetchone()
+            if not row:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE textes SET dernier_acces = ? WHERE sha256 = ?", (time.time(), sha256))
+            conn.commit()
+            self.hits += 1
+            return json.loads(row[0])
+
+    def set(self, sha256: str, pages: list):
+        """Enregistre le texte des pages puis applique les limites de taille (LRU)"""
+        now = time.time()
+        contenu = json.dumps(pages, ensure_ascii=False)
+        with self._lock, closing(self._connect()) as conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO textes (sha256, version, pages, nb_pages, taille, cree_le, dernier_acces)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (sha256, EXTRACTEUR_VERSION, contenu, len(pages), len(contenu.encode("utf-8")), now, now)
+            )
+            self._evict(conn)
+            conn.commit()
+
+    def _evict(self, conn):
+        """Supprime les textes d'anciennes versions puis les moins récemment utilisés"""
+        conn.execute("DELETE FROM textes WHERE version != ?", (EXTRACTEUR_VERSION,))
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(taille), 0) FROM textes").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+
+        rows = conn.execute("SELECT sha256, taille FROM textes ORDER BY dernier_acces ASC").fetchall()
+        to_delete = []
+        for sha256, size in rows:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            to_delete.append((sha256,))
+            count -= 1
+            total -= size
+        conn.executemany("DELETE FROM textes WHERE sha256 = ?", to_delete)
+
+    def stats(self) -> dict:
+        with self._lock, closing(self._connect()) as conn:
+            entries, size, pages = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(taille), 0), COALESCE(SUM(nb_pages), 0) FROM textes"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "entries": entries,
+            "pages": pages,
+            "size_bytes": size
+        }
+
+
+_text_cache = None
+_text_cache_lock = threading.Lock()
+
+
+def get_text_cache():
+    """Cache partagé du processus (None s'il est désactivé ou indisponible)"""
+    global _text_cache
+    if not config.PDF_TEXT_CACHE_ENABLED:
+        return None
+    with _text_cache_lock:
+        if _text_cache is None:
+            try:
+                _text_cache = PdfTextCache(
+                    config.PDF_TEXT_CACHE_PATH,
+                    max_entries=config.PDF_TEXT_CACHE_MAX_ENTRIES,
+                    max_bytes=config.PDF_TEXT_CACHE_MAX_BYTES
+                )
+            except (sqlite3.Error, OSError) as e:
+                st.warning(f"⚠️ Cache des textes PDF non disponible : {str(e)[:100]}")
+                return None
+        return _text_cache
+
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def _nombre_workers() -> int:
+    return config.PDF_PARALLEL_WORKERS or os.cpu_count() or 1
+
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    """
+    Pool de processus partagé pour l'extraction parallèle (créé au premier usage).
+    Démarrage « spawn » : un fork du serveur Streamlit copierait ses threads et
+    verrous (boucle asyncio, pools) dans un état incohérent.
+    """
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(
+                max_workers=_nombre_workers(), mp_context=multiprocessing.get_context("spawn")
+            )
+        return _process_pool
+
+
+def _reset_process_pool():
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+
+
+def _extraire_plage(data: bytes, debut: int, fin: int) -> list:
+    """Texte des pages [debut, fin) ; exécuté dans un processus du pool (chacun relit le PDF)"""
+    reader = PdfReader(io.BytesIO(data))
+    return [reader.pages[i].extract_text() or "" for i in range(debut, fin)]
+
+
+def extraire_pages_paralleles(data: bytes, nb_pages: int, workers: int = None) -> list:
+    """
+    Répartit les pages entre les processus du pool par plages contiguës
+    (deux par processus, pour équilibrer la charge) et réassemble le texte
+    dans l'ordre des pages.
+    """
+    workers = workers or _nombre_workers()
+    taille = max(1, -(-nb_pages // (workers * 2)))
+    plages = [(debut, min(debut + taille, nb_pages)) for debut in range(0, nb_pages, taille)]
+    pool = _get_process_pool()
+    futures = [pool.submit(_extraire_plage, data, debut, fin) for debut, fin in plages]
+    return [texte for future in futures for texte in future.result()]
+
+
+def _extraire(data: bytes) -> list:
+    """Extraction pypdf : en parallèle au-delà de PDF_PARALLEL_MIN_PAGES si plusieurs cœurs sont disponibles"""
+    reader = PdfReader(io.BytesIO(data))
+    nb_pages = len(reader.pages)
+    if config.PDF_PARALLEL_ENABLED and nb_pages >= config.PDF_PARALLEL_MIN_PAGES and _nombre_workers() > 1:
+        try:
+            return extraire_pages_paralleles(data, nb_pages)
+        except (BrokenProcessPool, OSError):
+            # Pool inutilisable (processus tué, ressources) : extraction séquentielle
+            _reset_process_pool()
+    return [page.extract_text() or "" for page in reader.pages]
+
+
+def extraire_pages(fichier) -> tuple:
+    """
+    Texte de chaque page du PDF, lu dans le cache si ce document a déjà été extrait.
+    Retourne (sha256 du PDF, liste des textes de pages).
+    """
+    data = lire_octets(fichier)
+    sha256 = hash_pdf(data)
+    cache = get_text_cache()
+    pages = cache.get(sha256) if cache else None
+    if pages is None:
+        pages = _extraire(data)
+        if cache:
+            cache.set(sha256, pages)
+    return sha256, pages
+
+
+def iter_pages(fichier):
+    """
+    Générateur paresseux du texte des pages, dans l'ordre : chaque page n'est
+    extraite que lorsqu'elle est demandée, ce qui permet de s'arrêter dès que
+    le besoin est couvert. Un document en cache est servi sans extraction ;
+    un document parcouru jusqu'au bout est mis en cache.
+    """
+    data = lire_octets(fichier)
+    sha256 = hash_pdf(data)
+    cache = get_text_cache()
+    pages = cache.get(sha256) if cache else None
+    if pages is not None:
+        yield from pages
+        return
+    extraites = []
+    for page in PdfReader(io.BytesIO(data)).pages:
+        extraites.append(page.extract_text() or "")
+        yield extraites[-1]
+    if cache:
+        cache.set(sha256, extraites)
+
+
+def extraire_debut(fichier, max_caracteres: int) -> tuple:
+    """
+    Texte des premières pages, jusqu'à couvrir `max_caracteres` (arrêt anticipé :
+    les pages suivantes ne sont pas extraites). Pour le document complet,
+    utiliser extraire_pages().
+    Retourne (sha256 du PDF, pages lues, nombre total de pages).
+    """
+    data = lire_octets(fichier)
+    pages, total = [], 0
+    for texte in iter_pages(data):
+        pages.append(texte)
+        total += len(texte) + 1
+        if total >= max_caracteres:
+            break
+    return hash_pdf(data), pages, len(PdfReader(io.BytesIO(data)).pages)
+
+
+def joindre_pages(pages: list) -> str:
+    """Texte complet du document (pages séparées par un saut de ligne, sans coller leurs lignes)"""
+    return "\n".join(pages)
+
+
+def champs_soumission(sha256: str, pages: list = None) -> dict:
+    """
+    Champs à ajouter à analyse_json pour retrouver le texte plus tard :
+    le SHA-256 du PDF et, si PDF_TEXT_STORE_IN_SOUMISSION, le texte des pages
+    (seulement pour un document lu en entier).
+    """
+    champs = {"pdf_sha256": sha256}
+    if pages is not None and config.PDF_TEXT_STORE_IN_SOUMISSION:
+        champs["pages_texte"] = pages
+    return champs
+
+
+def pages_soumission(sha256: str, charger_pages=None):
+    """
+    Texte des pages du PDF analysé d'une soumission (analyse_json["pdf_sha256"]) :
+    cache local, sinon `charger_pages()` (texte conservé dans analyse_json), sinon None
+    """
+    cache = get_text_cache()
+    if sha256 and cache:
+        pages = cache.get(sha256)
+        if pages is not None:
+            return pages
+    pages = charger_pages() if charger_pages else None
+    if pages and sha256 and cache:
+        cache.set(sha256, pages)
+    return pages or None
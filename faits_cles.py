@@ -0,0 +1,247 @@
+"""
+Extraction déterministe des dates et montants clés d'un appel d'offres
+
+Les dates (« 15 mars 2025 », « 1er avril 2025 à 14 h », « 2025-03-15 »,
+« 15/03/2025 ») et montants (« 1 250 000,00 $ », « 2,5 M$ », « 10 % »)
+sont repérés par expressions régulières puis classés d'après les mots qui
+les précèdent (visite, clôture, cautionnement...). Les délais en jours
+ouvrables sont calculés localement (fins de semaine et jours fériés du
+Québec exclus) et fournis au modèle, qui n'a plus à les recalculer.
+"""
+import re
+import unicodedata
+from datetime import date
+import config
+from utils import business_days_between, quebec_holidays
+
+VERSION_FAITS = 1
+
+MOIS = {
+    "janvier": 1, "janv": 1, "fevrier": 2, "fevr": 2, "fev": 2, "mars": 3, "avril": 4, "avr": 4,
+    "mai": 5, "juin": 6, "juillet": 7, "juil": 7, "aout": 8, "septembre": 9, "sept": 9,
+    "octobre": 10, "oct": 10, "novembre": 11, "nov": 11, "decembre": 12, "dec": 12
+}
+_MOIS = "|".join(sorted(MOIS, key=len, reverse=True))
+
+# Les expressions s'appliquent au texte sans accents et en minuscules (même longueur que l'original)
+_DATES = [
+    re.compile(rf"\b(?P<jour>[0-3]?\d)(?:er)?\s+(?P<mois>{_MOIS})\.?,?\s+(?P<annee>20\d\d)\b"),
+    re.compile(r"\b(?P<annee>20\d\d)-(?P<mois>[01]?\d)-(?P<jour>[0-3]?\d)\b"),
+    re.compile(r"\b(?P<jour>[0-3]?\d)/(?P<mois>[01]?\d)/(?P<annee>20\d\d)\b")
+]
+_HEURE = re.compile(r"\s*,?\s*(?:a|des|vers)?\s*(?P<h>[01]?\d|2[0-3])\s*(?:h|:)\s*(?P<m>[0-5]\d)?")
+_MONTANTS = [
+    (re.compile(r"(?<![\d,.])(?P<nombre>\d+(?:[,.]\d+)?)\s*(?:m\$|millions?\s+(?:de\s+dollars|\$))"), 1_000_000, "$"),
+    (re.compile(r"(?<![\d,.])(?P<nombre>\d{1,3}(?:[ \u00a0\u202f.,]\d{3})+(?:[,.]\d\d)?|\d+(?:[,.]\d\d)?)\s*\$"), 1, "$"),
+    (re.compile(r"\$\s*(?P<nombre>\d{1,3}(?:,\d{3})+(?:\.\d\d)?|\d+(?:\.\d\d)?)(?![\d,])"), 1, "$"),
+    (re.compile(r"(?<![\d,.])(?P<nombre>\d{1,3}(?:[,.]\d+)?)\s*%"), 1, "%")
+]
+
+# Mots-clés précédant une date ou un montant (le plus proche l'emporte)
+CATEGORIES_DATES = {
+    "questions": ("questions", "demandes de precision", "demande de renseignements"),
+    "visite": ("visite",),
+    "cloture": ("cloture", "depot des soumissions", "ouverture des soumissions", "reception des soumissions",
+                "soumissions seront recues", "soumissions doivent etre recues", "soumissions doivent etre deposees",
+                "au plus tard le", "date limite"),
+    "debut_travaux": ("debut des travaux", "commencement des travaux", "mise en chantier", "debuter les travaux"),
+    "fin_travaux": ("fin des travaux", "achevement", "parachevement", "terminer les travaux")
+}
+CATEGORIES_MONTANTS = {
+    "estimation": ("estimation", "estime", "budget", "valeur du contrat", "valeur estimee", "enveloppe"),
+    "cautionnement_soumission": ("cautionnement de soumission", "garantie de soumission"),
+    "cautionnement_execution": ("cautionnement d'execution", "garantie d'execution"),
+    "cautionnement_paiement": ("gages, materiaux", "obligations pour gages", "paiement de la main"),
+    "assurance_responsabilite": ("assurance", "responsabilite civile"),
+    "penalite_retard": ("penalite", "dommages-interets")
+}
+LIBELLES = {
+    "questions": "Date limite des questions",
+    "visite": "Visite des lieux",
+    "cloture": "Clôture des soumissions",
+    "debut_travaux": "Début des travaux",
+    "fin_travaux": "Fin des travaux",
+    "estimation": "Estimation / budget",
+    "cautionnement_soumission": "Cautionnement de soumission",
+    "cautionnement_execution": "Cautionnement d'exécution",
+    "cautionnement_paiement": "Cautionnement des obligations (gages, matériaux et services)",
+    "assurance_responsabilite": "Assurance responsabilité civile",
+    "penalite_retard": "Pénalité de retard"
+}
+CONTEXTE = 160
+# Fin de phrase ou de ligne : le mot-clé d'une date doit se trouver dans la même phrase
+_FIN_PHRASE = re.compile(r"[.;!?](?:\s|$)|\n")
+
+
+def _pli(texte: str) -> str:
+    """Minuscules sans accents, caractère pour caractère (les positions restent valides)"""
+    return texte.translate({ord(c): _pli_caractere(c) for c in set(texte)})
+
+
+def _pli_caractere(c: str) -> str:
+    if c == "’":
+        return "'"
+    minuscule = c.lower()
+    if len(minuscule) != 1:
+        return c
+    return unicodedata.normalize("NFKD", minuscule)[0] if minuscule.isalpha() else minuscule
+
+
+def _extrait(texte: str, debut: int, fin: int) -> str:
+    """Phrase autour d'une valeur, pour la vérifier dans le document"""
+    avant = texte[max(0, debut - 60):debut].split()[1:] if debut > 60 else texte[:debut].split()
+    return " ".join(avant + texte[debut:fin].split())
+
+
+def _categorie(pli: str, debut: int, borne: int, categories: dict):
+    """
+    Catégorie dont un mot-clé est le plus proche avant `debut`, dans la même
+    phrase ou ligne (sans remonter avant `borne`, la valeur précédente)
+    """
+    contexte = pli[max(borne, debut - CONTEXTE):debut]
+    fins = list(_FIN_PHRASE.finditer(contexte))
+    if fins:
+        contexte = contexte[fins[-1].end():]
+    meilleure, position = None, -1
+    for categorie, mots in categories.items():
+        for mot in mots:
+            trouve = contexte.rfind(mot)
+            if trouve > position:
+                meilleure, position = categorie, trouve
+    return meilleure
+
+
+def _dates(pli: str) -> list:
+    """(début, fin, date, heure) de chaque date valide, dans l'ordre du texte"""
+    trouvees = []
+    for expression in _DATES:
+        for m in expression.finditer(pli):
+            mois = MOIS.get(m.group("mois")) or int(m.group("mois"))
+            try:
+                valeur = date(int(m.group("annee")), mois, int(m.group("jour")))
+            except ValueError:
+                continue
+            heure = _HEURE.match(pli, m.end())
+            fin = heure.end() if heure else m.end()
+            trouvees.append((m.start(), fin, valeur,
+                             f"{int(heure.group('h')):02d}:{heure.group('m') or '00'}" if heure else None))
+    trouvees.sort(key=lambda t: t[0])
+    # Une même position reconnue par deux expressions n'est gardée qu'une fois
+    return [t for i, t in enumerate(trouvees) if i == 0 or t[0] >= trouvees[i - 1][1]]
+
+
+def _nombre(texte: str) -> float:
+    """« 1 250 000,00 », « 1,250,000.00 » ou « 2,5 » en nombre"""
+    texte = re.sub(r"[ \u00a0\u202f]", "", texte)
+    decimales = re.search(r"[,.](\d{1,2})$", texte)
+    if decimales:
+        return float(re.sub(r"[,.]", "", texte[:decimales.start()]) + "." + decimales.group(1))
+    return float(re.sub(r"[,.]", "", texte))
+
+
+def _montants(pli: str) -> list:
+    """(début, fin, valeur, unité) de chaque montant, dans l'ordre du texte"""
+    trouves = []
+    for expression, multiple, unite in _MONTANTS:
+        for m in expression.finditer(pli):
+            try:
+                valeur = _nombre(m.group("nombre")) * multiple
+            except ValueError:
+                continue
+            trouves.append((m.start(), m.end(), valeur, unite))
+    trouves.sort(key=lambda t: t[0])
+    return [t for i, t in enumerate(trouves) if i == 0 or t[0] >= trouves[i - 1][1]]
+
+
+def _jours_feries(*dates) -> set:
+    if not config.FAITS_JOURS_FERIES_QUEBEC:
+        return set()
+    annees = {d.year for d in dates if d}
+    return set().union(*(quebec_holidays(annee) for annee in range(min(annees), max(annees) + 1)))
+
+
+def extraire_faits(texte: str, aujourd_hui: date = None) -> dict:
+    """
+    Dates et montants clés du texte (première occurrence de chaque catégorie)
+    et délais en jours ouvrables depuis `aujourd_hui` (défaut : date du jour).
+    Dates au format ISO, montants en dollars (ou en % pour les cautionnements).
+    """
+    aujourd_hui = aujourd_hui or date.today()
+    pli = _pli(texte)
+
+    dates, borne = {}, 0
+    for debut, fin, valeur, heure in _dates(pli):
+        categorie = _categorie(pli, debut, borne, CATEGORIES_DATES)
+        borne = fin
+        if categorie and categorie not in dates:
+            dates[categorie] = {"date": valeur.isoformat(), "heure": heure, "extrait": _extrait(texte, debut, fin)}
+
+    montants, borne = {}, 0
+    for debut, fin, valeur, unite in _montants(pli):
+        categorie = _categorie(pli, debut, borne, CATEGORIES_MONTANTS)
+        borne = fin
+        if unite == "%" and not (categorie or "").startswith("cautionnement"):
+            continue
+        if categorie and categorie not in montants:
+            montants[categorie] = {"valeur": valeur, "unite": unite, "extrait": _extrait(texte, debut, fin)}
+
+    jours = {categorie: date.fromisoformat(d["date"]) for categorie, d in dates.items()}
+    feries = _jours_feries(aujourd_hui, *jours.values())
+    delais = {}
+    if "visite" in jours:
+        delais["jours_ouvrables_avant_visite"] = business_days_between(aujourd_hui, jours["visite"], feries)
+    if "cloture" in jours:
+        delais["jours_ouvrables_avant_cloture"] = business_days_between(aujourd_hui, jours["cloture"], feries)
+    if "visite" in jours and "cloture" in jours:
+        delais["jours_ouvrables_visite_cloture"] = business_days_between(jours["visite"], jours["cloture"], feries)
+    if "debut_travaux" in jours and "fin_travaux" in jours:
+        delais["duree_travaux_jours"] = (jours["fin_travaux"] - jours["debut_travaux"]).days
+
+    return {
+        "version": VERSION_FAITS,
+        "date_reference": aujourd_hui.isoformat(),
+        "dates": dates,
+        "montants": montants,
+        "delais": delais
+    }
+
+
+def _montant(valeur: float, unite: str) -> str:
+    if unite == "%":
+        return f"{valeur:g} %"
+    return f"{valeur:,.2f}".replace(",", " ").replace(".", ",").replace(",00", "") + " $"
+
+
+def _delai(jours: int) -> str:
+    if jours < 0:
+        return f"date passée (il y a {-jours} jour(s) ouvrable(s))"
+    return f"dans {jours} jour(s) ouvrable(s)"
+
+
+def resume_faits(faits: dict) -> str:
+    """Faits précalculés à insérer dans le prompt ("" si rien n'a été trouvé)"""
+    if not faits or not (faits["dates"] or faits["montants"]):
+        return ""
+    delais = faits["delais"]
+    lignes = [
+        "FAITS EXTRAITS AUTOMATIQUEMENT DU DOCUMENT (jours ouvrables calculés depuis la DATE DU JOUR, "
+        "fins de semaine et jours fériés du Québec exclus). Ce sont des indices repérés par mots-clés : "
+        "vérifiez chaque date dans le document avant de l'utiliser ; si elle est confirmée, reprenez "
+        "les délais calculés au lieu de les recalculer, sinon fiez-vous au document."
+    ]
+    for categorie, valeur in faits["dates"].items():
+        ligne = f"- {LIBELLES[categorie]} : {valeur['date']}"
+        if valeur["heure"]:
+            ligne += f" à {valeur['heure']}"
+        if categorie == "visite" and "jours_ouvrables_avant_visite" in delais:
+            ligne += f" → {_delai(delais['jours_ouvrables_avant_visite'])}"
+        if categorie == "cloture" and "jours_ouvrables_avant_cloture" in delais:
+            ligne += f" → {_delai(delais['jours_ouvrables_avant_cloture'])}"
+        lignes.append(ligne + f" (« {valeur['extrait']} »)")
+    if "jours_ouvrables_visite_cloture" in delais:
+        lignes.append(f"- Délai visite → clôture : {delais['jours_ouvrables_visite_cloture']} jour(s) ouvrable(s)")
+    if "duree_travaux_jours" in delais:
+        lignes.append(f"- Durée des travaux : {delais['duree_travaux_jours']} jour(s) de calendrier")
+    for categorie, valeur in faits["montants"].items():
+        lignes.append(f"- {LIBELLES[categorie]} : {_montant(valeur['valeur'], valeur['unite'])} (« {valeur['extrait']} »)")
+    return "\n".join(lignes) + "\n\n"
@@ -6,21 +6,70 @@ from pypdf import PdfReader
 from datetime import datetime
 import json
 import re
-from llm_manager import LLMManager
+import config
+from llm_budget import pack_sections
+from llm_manager import get_llm_manager
+from llm_mapreduce import analyser_par_blocs
+from pertinence import selectionner_passages
 import database
 
 
-llm_manager = LLMManager()
-
-
-def extraire_exigences_appel_offre(texte_pdf):
-    """Extrait les exigences clés d'un appel d'offres"""
-    try:
-        prompt = f"""
+_TEXTE = {"type": "string"}
+_LISTE_TEXTES = {"type": "array", "items": _TEXTE}
+
+
+def _objet(**proprietes):
+    return {"type": "object", "properties": proprietes, "required": list(proprietes)}
+
+
+# Schémas imposés aux réponses JSON (mode structuré des fournisseurs + vérification locale)
+EXIGENCES_SCHEMA = _objet(
+    numero_projet=_TEXTE,
+    nom_projet=_TEXTE,
+    client=_TEXTE,
+    date_cloture=_TEXTE,
+    duree_projet=_TEXTE,
+    budget_estime=_TEXTE,
+    sommaire=_TEXTE,
+    methodologie_requise=_LISTE_TEXTES,
+    livrables=_LISTE_TEXTES,
+    exigences_techniques=_LISTE_TEXTES,
+    criteres_evaluation=_LISTE_TEXTES,
+    documents_requis=_LISTE_TEXTES
+)
+
+OFFRE_TECHNIQUE_SCHEMA = _objet(
+    titre_offre=_TEXTE,
+    introduction=_TEXTE,
+    comprehension_projet=_TEXTE,
+    approche_methodologique=_objet(
+        description=_TEXTE,
+        phases={"type": "array", "items": _objet(nom=_TEXTE, description=_TEXTE, duree=_TEXTE)}
+    ),
+    equipe_proposee={"type": "array", "items": _objet(
+        role=_TEXTE, nom=_TEXTE, experience=_TEXTE, responsabilites=_LISTE_TEXTES
+    )},
+    livrables={"type": "array", "items": _objet(nom=_TEXTE, description=_TEXTE, format=_TEXTE)},
+    calendrier={"type": "array", "items": _objet(etape=_TEXTE, date_debut=_TEXTE, date_fin=_TEXTE)},
+    garanties_qualite=_LISTE_TEXTES,
+    references_clients=_TEXTE,
+    avantages_concurrentiels=_LISTE_TEXTES
+)
+
+
+# Sujets recherchés dans les longs documents (sélection des passages envoyés au modèle)
+TERMES_EXIGENCES = [
+    "numéro de projet", "donneur d'ouvrage client", "date de clôture", "durée du contrat",
+    "budget estimation", "portée des travaux", "méthodologie", "livrables", "exigences techniques",
+    "devis spécifications", "critères d'évaluation pondération", "documents requis formulaire",
+    "attestation", "cautionnement"
+]
+
+PROMPT_EXIGENCES = """
 Analyse cet appel d'offres et extrais les exigences clés en format JSON strict.
 
 DOCUMENT :
-{texte_pdf[:8000]}
+{document}
 
 Réponds UNIQUEMENT avec un objet JSON (sans markdown, sans ```json) :
 {{
@@ -38,13 +87,38 @@ Réponds UNIQUEMENT avec un objet JSON (sans markdown, sans ```json) :
     "documents_requis": ["doc 1", "doc 2"]
 }}
 """
+
+
+def _sections_exigences(document, budget, provider_type):
+    """Consignes et document (passages pertinents s'il dépasse le budget) ; retourne (sections, rapport)"""
+    return pack_sections([
+        {"name": "consignes", "text": PROMPT_EXIGENCES.format(document=""), "required": True},
+        {"name": "document", "text": document,
+         "fit": lambda texte, max_tokens, fournisseur: selectionner_passages(
+             texte, TERMES_EXIGENCES, max_tokens, fournisseur
+         )}
+    ], budget, provider_type)
+
+
+def extraire_exigences_appel_offre(texte_pdf, pages=None):
+    """
+    Extrait les exigences clés d'un appel d'offres.
+    Un document trop long pour un seul appel est lu par parties (config.LLM_MAP_REDUCE_ENABLED) :
+    exigences partielles de chaque bloc de `pages` (ou du texte) en parallèle, puis fusion.
+    """
+    try:
+        budget, provider_type = get_llm_manager().input_budget(task="exigences")
+        sections, rapport = _sections_exigences(texte_pdf, budget, provider_type)
+        if config.LLM_MAP_REDUCE_ENABLED and rapport["sections"][-1]["truncated"]:
+            notes, rapport_parties = analyser_par_blocs(pages or [texte_pdf], EXIGENCES_SCHEMA, TERMES_EXIGENCES)
+            if rapport_parties["reussis"]:
+                sections, _ = _sections_exigences(notes, budget, provider_type)
+        prompt = PROMPT_EXIGENCES.format(document=sections["document"])
         
-        result = llm_manager.analyze(prompt, max_tokens=2000)
+        result = get_llm_manager().analyze_json(prompt, schema=EXIGENCES_SCHEMA, task="exigences")
         
         if result["success"]:
-            texte = result["result"].strip()
-            texte = texte.replace("```json", "").replace("```", "").strip()
-            return json.loads(texte)
+            return result["result"]
         else:
             st.error(f"❌ Erreur extraction : {result['error']}")
             return None
@@ -106,12 +180,11 @@ Réponds UNIQUEMENT avec un objet JSON (sans markdown) :
 }}
 """
         
-        result = llm_manager.analyze(prompt, max_tokens=3000)
+        result = get_llm_manager().analyze_json(prompt, schema=OFFRE_TECHNIQUE_SCHEMA,
+                                                task="offre_technique")
         
         if result["success"]:
-            texte = result["result"].strip()
-            texte = texte.replace("```json", "").replace("```", "").strip()
-            return json.loads(texte)
+            return result["result"]
         else:
             st.error(f"❌ Erreur génération : {result['error']}")
             return None
@@ -6,9 +6,8 @@ Ordonnancement, dependances, diagramme de Gantt
 """
 
 import streamlit as st
-import anthropic
-import config
 import database
+from llm_manager import get_llm_manager
 from datetime import datetime, date, timedelta
 import json
 from typing import List, Optional
@@ -91,7 +90,6 @@ def _element_vide(type_el: str, nom: str = "") -> dict:
 
 def analyser_offre_pour_demarrage(offre_data: dict, user: dict) -> dict:
     try:
-        client = anthropic.Anthropic(api_key=config.ANTHROPIC_API_KEY)
         nom = (
             offre_data.get('offre_technique', {}).get('titre_offre')
             or offre_data.get('projet', {}).get('nom', '')
@@ -106,13 +104,11 @@ JSON uniquement:
   "risques": [{{"description":"Retard","impact":"Moyen","probabilite":"Moyenne","mitigation":"Suivi hebdo"}}],
   "inclusions": ["Installation selon plans"], "exclusions": ["Travaux civils"]
 }}"""
-        msg = client.messages.create(
-            model="claude-sonnet-4-20250514", max_tokens=1500,
-            messages=[{"role": "user", "content": prompt}]
-        )
-        text = msg.content[0].text
-        idx = text.find('{')
-        return json.loads(text[idx:text.rfind('}') + 1]) if idx >= 0 else {}
+        result = get_llm_manager().analyze_json(prompt, task="demarrage")
+        if not result["success"]:
+            st.warning(f"Suggestions IA non disponibles : {result['error']}")
+            return {}
+        return result["result"] if isinstance(result["result"], dict) else {}
     except Exception as e:
         st.warning(f"Suggestions IA non disponibles : {e}")
         return {}
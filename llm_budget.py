@@ -0,0 +1,82 @@
+"""
+Budget de tokens des prompts : comptage par fournisseur et répartition entre sections
+"""
+import math
+import config
+
+MARQUEUR_TRONCATURE = "\n[... suite tronquée pour respecter la limite du modèle ...]"
+
+
+def count_tokens(text: str, provider_type: str = None) -> int:
+    """Estimation du nombre de tokens selon le ratio caractères/token du fournisseur"""
+    ratio = config.LLM_CHARS_PER_TOKEN.get(provider_type, 4.0)
+    return math.ceil(len(text) / ratio)
+
+
+def truncate_to_tokens(text: str, max_tokens: int, provider_type: str = None, by_lines: bool = False) -> str:
+    """
+    Coupe le texte pour qu'il tienne dans `max_tokens`, en fin de ligne
+    (by_lines=True : seules des lignes entières sont gardées) ou en fin de
+    phrase/mot, avec un marqueur indiquant la troncature.
+    """
+    if count_tokens(text, provider_type) <= max_tokens:
+        return text
+    if max_tokens <= count_tokens(MARQUEUR_TRONCATURE, provider_type):
+        return ""
+    ratio = config.LLM_CHARS_PER_TOKEN.get(provider_type, 4.0)
+    limite = int((max_tokens - count_tokens(MARQUEUR_TRONCATURE, provider_type)) * ratio)
+    coupe = text[:limite]
+    if by_lines:
+        coupe = coupe[:coupe.rfind("\n")] if "\n" in coupe else ""
+    else:
+        # Revenir à la dernière fin de phrase, sinon au dernier espace (pas de mot coupé)
+        fin = max(coupe.rfind(". "), coupe.rfind("\n"))
+        if fin < limite * 0.8:
+            fin = coupe.rfind(" ")
+        if fin > 0:
+            coupe = coupe[:fin + 1]
+    return coupe.rstrip() + MARQUEUR_TRONCATURE if coupe.strip() else ""
+
+
+def pack_sections(sections: list, budget: int, provider_type: str = None) -> tuple:
+    """
+    Répartit un budget de tokens entre les sections d'un prompt.
+
+    Chaque section est un dict {"name", "text", "required", "max_share", "by_lines", "fit"} :
+    - les sections requises (instructions, profil) sont comptées en entier
+    - les autres reçoivent, dans l'ordre, ce qui reste, plafonné à
+      `max_share` du budget disponible après les sections requises
+    - `fit(texte, max_tokens, provider_type)` remplace la troncature
+      (ex. sélection des passages pertinents)
+
+    Retourne ({nom: texte retenu}, rapport).
+    """
+    requis = sum(count_tokens(s["text"], provider_type) for s in sections if s.get("required"))
+    disponible = max(0, budget - requis)
+    restant = disponible
+    textes = {}
+    rapport = {"budget_tokens": budget, "provider_type": provider_type, "sections": []}
+
+    for section in sections:
+        original = count_tokens(section["text"], provider_type)
+        if section.get("required"):
+            texte = section["text"]
+        else:
+            plafond = restant
+            if section.get("max_share") is not None:
+                plafond = min(plafond, int(disponible * section["max_share"]))
+            if section.get("fit"):
+                texte = section["fit"](section["text"], plafond, provider_type)
+            else:
+                texte = truncate_to_tokens(section["text"], plafond, provider_type, section.get("by_lines", False))
+            restant -= count_tokens(texte, provider_type)
+        textes[section["name"]] = texte
+        rapport["sections"].append({
+            "name": section["name"],
+            "tokens": count_tokens(texte, provider_type),
+            "original_tokens": original,
+            "truncated": texte != section["text"]
+        })
+
+    rapport["used_tokens"] = sum(s["tokens"] for s in rapport["sections"])
+    return textes, rapport
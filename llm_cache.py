@@ -0,0 +1,160 @@
+"""
+Cache persistant (SQLite) des réponses LLM, adressé par contenu
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+
+def make_cache_key(prompt: str, provider_type: str, model: str, params: dict) -> str:
+    """Calcule la clé SHA-256 d'un appel (prompt, fournisseur/modèle, paramètres)"""
+    payload = json.dumps(
+        {"prompt": prompt, "provider": provider_type, "model": model, "params": params},
+        sort_keys=True,
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    Cache disque des réponses LLM avec expiration (TTL) et éviction LRU.
+
+    Les compteurs hits/misses couvrent le processus courant ; la colonne
+    `hits` de chaque entrée conserve le nombre d'appels payants évités
+    depuis la création du fichier.
+    """
+
+    def __init__(self, path: str, max_entries: int = 500, max_bytes: int = 50_000_000,
+                 ttl_seconds: int = 7 * 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock, closing(self._connect()) as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS reponses (
+                    cle TEXT PRIMARY KEY,
+                    provider TEXT NOT NULL,
+                    reponse TEXT NOT NULL,
+                    taille INTEGER NOT NULL,
+                    cree_le REAL NOT NULL,
+                    dernier_acces REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_reponses_acces ON reponses (dernier_acces)")
+            conn.commit()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    def get(self, key: str, count: bool = True):
+        """
+        Retourne (provider, réponse) si la clé est présente et non expirée, sinon None.
+        count=False : hits/misses non comptés (l'appelant compte une seule fois une
+        recherche qui porte sur plusieurs clés, voir record_lookup)
+        """
+        now = time.time()
+        with self._lock, closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT provider, reponse, cree_le FROM reponses WHERE cle = ?", (key,)
+            ).fetchone()
+            if row and self.ttl_seconds and now - row[2] > self.ttl_seconds:
+                conn.execute("DELETE FROM reponses WHERE cle = ?", (key,))
+                conn.commit()
+                row = None
+            if not row:
+                if count:
+                    self.misses += 1
+                return None
+            conn.execute(
+                "UPDATE reponses SET dernier_acces = ?, hits = hits + 1 WHERE cle = ?", (now, key)
+            )
+            conn.commit()
+            if count:
+                self.hits += 1
+            return row[0], row[1]
+
+    def record_lookup(self, hit: bool):
+        """Compte une recherche logique (un hit ou un miss)"""
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def set(self, key: str, provider: str, response: str):
+        """Enregistre une réponse puis applique les limites de taille (LRU)"""
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._lock, closing(self._connect()) as conn:
+            conn.execute(
+                """
+                INSERT INTO reponses (cle, provider, reponse, taille, cree_le, dernier_acces, hits)
+                VALUES (?, ?, ?, ?, ?, ?, 0)
+                ON CONFLICT(cle) DO UPDATE SET
+                    provider = excluded.provider,
+                    reponse = excluded.reponse,
+                    taille = excluded.taille,
+                    cree_le = excluded.cree_le,
+                    dernier_acces = excluded.dernier_acces
+                """,
+                (key, provider, response, size, now, now)
+            )
+            self._evict(conn)
+            conn.commit()
+
+    def _evict(self, conn):
+        """Supprime les entrées expirées puis les moins récemment utilisées"""
+        if self.ttl_seconds:
+            conn.execute("DELETE FROM reponses WHERE cree_le < ?", (time.time() - self.ttl_seconds,))
+
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(taille), 0) FROM reponses").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+
+        rows = conn.execute("SELECT cle, taille FROM reponses ORDER BY dernier_acces ASC").fetchall()
+        to_delete = []
+        for key, size in rows:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            to_delete.append((key,))
+            count -= 1
+            total -= size
+        conn.executemany("DELETE FROM reponses WHERE cle = ?", to_delete)
+
+    def clear(self):
+        """Vide le cache"""
+        with self._lock, closing(self._connect()) as conn:
+            conn.execute("DELETE FROM reponses")
+            conn.commit()
+
+    def stats(self) -> dict:
+        """Statistiques du cache (hits/misses du processus et appels évités au total)"""
+        with self._lock, closing(self._connect()) as conn:
+            entries, size, saved = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(taille), 0), COALESCE(SUM(hits), 0) FROM reponses"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "entries": entries,
+            "size_bytes": size,
+            "saved_calls_total": saved
+        }
@@ -0,0 +1,195 @@
+"""
+Santé des fournisseurs LLM : disjoncteur (circuit breaker) et classement dynamique
+"""
+import threading
+import time
+from collections import deque
+import config
+
+
+class CircuitOpenError(Exception):
+    """Le disjoncteur du fournisseur est ouvert : l'appel n'est pas tenté"""
+
+
+class CircuitBreaker:
+    """
+    Disjoncteur à trois états.
+
+    - closed    : les appels passent ; N échecs consécutifs ouvrent le circuit
+    - open      : les appels sont refusés pendant `cooldown_seconds`
+    - half_open : un seul appel d'essai ; succès → closed, échec → open
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, cooldown_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def _cooldown_elapsed(self) -> bool:
+        return self.opened_at is not None and time.monotonic() - self.opened_at >= self.cooldown_seconds
+
+    def is_available(self) -> bool:
+        """Indique si un appel serait accepté (sans réserver l'essai en demi-ouverture)"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                return self._cooldown_elapsed()
+            return not self._probe_in_flight
+
+    def try_acquire(self) -> bool:
+        """Réserve le droit d'appeler ; passe en demi-ouverture une fois le délai écoulé"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if not self._cooldown_elapsed():
+                    return False
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            self._probe_in_flight = False
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def release(self):
+        """Libère un essai réservé qui n'a finalement pas abouti à un résultat (ex. annulation)"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            retry_in = None
+            if self.state == self.OPEN and self.opened_at is not None:
+                retry_in = max(0.0, self.cooldown_seconds - (time.monotonic() - self.opened_at))
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "retry_in_seconds": round(retry_in, 1) if retry_in is not None else None
+            }
+
+
+class ProviderHealth:
+    """
+    Fenêtre glissante des derniers appels (succès, latence) et disjoncteur d'un fournisseur.
+    Les mesures plus vieilles que LLM_HEALTH_MAX_AGE_SECONDS sont ignorées, ce qui
+    redonne sa place à un fournisseur rétabli même s'il n'a plus été sollicité.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.breaker = CircuitBreaker(
+            config.LLM_BREAKER_FAILURE_THRESHOLD,
+            config.LLM_BREAKER_COOLDOWN_SECONDS
+        )
+        self._window = deque(maxlen=config.LLM_HEALTH_WINDOW)
+        self._lock = threading.Lock()
+
+    def _recent(self) -> list:
+        cutoff = time.monotonic() - config.LLM_HEALTH_MAX_AGE_SECONDS
+        with self._lock:
+            return [(ok, latency) for ts, ok, latency in self._window if ts >= cutoff]
+
+    def record(self, success: bool, latency: float):
+        with self._lock:
+            self._window.append((time.monotonic(), success, latency))
+        if success:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+    def success_rate(self) -> float:
+        recent = self._recent()
+        if not recent:
+            return 1.0
+        return sum(1 for ok, _ in recent if ok) / len(recent)
+
+    def ranking_key(self):
+        """
+        Clé de classement : (taux de succès par paliers de 10 %, latence moyenne par
+        paliers d'une seconde), ou None sous LLM_HEALTH_MIN_SAMPLES appels récents
+        """
+        recent = self._recent()
+        if len(recent) < config.LLM_HEALTH_MIN_SAMPLES:
+            return None
+        latencies = [latency for ok, latency in recent if ok]
+        avg_latency = sum(latencies) / len(latencies) if latencies else float("inf")
+        return -round(len(latencies) / len(recent), 1), round(avg_latency)
+
+    def avg_latency(self) -> float:
+        """Latence moyenne des appels réussis récents (0 tant qu'aucune mesure)"""
+        latencies = [latency for ok, latency in self._recent() if ok]
+        return sum(latencies) / len(latencies) if latencies else 0.0
+
+    def snapshot(self) -> dict:
+        calls = len(self._recent())
+        return dict(
+            self.breaker.snapshot(),
+            provider=self.name,
+            calls=calls,
+            success_rate=round(self.success_rate(), 3),
+            avg_latency_seconds=round(self.avg_latency(), 3)
+        )
+
+
+# Registre partagé par toutes les sessions du processus
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def get_health(provider_name: str) -> ProviderHealth:
+    with _registry_lock:
+        health = _registry.get(provider_name)
+        if health is None:
+            health = _registry[provider_name] = ProviderHealth(provider_name)
+        return health
+
+
+def rank_providers(providers: list) -> list:
+    """
+    Classe les fournisseurs disponibles selon leur santé (voir ranking_key).
+    Seuls ceux qui ont assez de mesures récentes sont permutés, entre eux ; les
+    autres gardent leur place, et l'ordre configuré est conservé à égalité.
+    Les fournisseurs au circuit ouvert sont écartés ; s'ils le
+    sont tous, la liste complète est retournée pour que l'échec de l'appel
+    nomme chaque disjoncteur, mais aucun n'est appelé avant la fin de son
+    délai de refroidissement (voir CircuitBreaker.try_acquire).
+    """
+    available = [p for p in providers if get_health(p["name"]).breaker.is_available()]
+    if not available:
+        return list(providers)
+    keys = [get_health(p["name"]).ranking_key() for p in available]
+    measured = [i for i, key in enumerate(keys) if key is not None]
+    ranked = list(available)
+    for slot, i in zip(measured, sorted(measured, key=lambda i: keys[i])):
+        ranked[slot] = available[i]
+    return ranked
+
+
+def health_snapshot() -> list:
+    """État de tous les fournisseurs connus (pour l'instrumentation)"""
+    with _registry_lock:
+        healths = list(_registry.values())
+    return [health.snapshot() for health in healths]
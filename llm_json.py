@@ -0,0 +1,185 @@
+"""
+Sortie JSON structurée des LLM : réparation tolérante et conformité à un schéma
+"""
+import json
+import re
+
+# Sous-ensemble de JSON Schema accepté par Gemini (response_schema)
+_GEMINI_SCHEMA_KEYS = {"type", "format", "description", "nullable", "enum", "properties", "items", "required"}
+
+_LITTERAUX_PYTHON = {"True": "true", "False": "false", "None": "null"}
+
+
+class JSONRepairError(ValueError):
+    """La réponse ne contient aucun JSON récupérable"""
+
+
+def gemini_schema(schema: dict) -> dict:
+    """Réduit un schéma aux mots-clés supportés par Gemini"""
+    reduit = {k: v for k, v in schema.items() if k in _GEMINI_SCHEMA_KEYS}
+    if "properties" in reduit:
+        reduit["properties"] = {nom: gemini_schema(sous) for nom, sous in reduit["properties"].items()}
+    if "items" in reduit:
+        reduit["items"] = gemini_schema(reduit["items"])
+    return reduit
+
+
+def _extraire_bloc(texte: str) -> str:
+    """Retire les balises ```json et le texte qui précède le premier { ou ["""
+    fence = re.search(r"```(?:json)?\s*(.*?)(?:```|$)", texte, re.DOTALL | re.IGNORECASE)
+    if fence and fence.group(1).strip():
+        texte = fence.group(1)
+    debuts = [i for i in (texte.find("{"), texte.find("[")) if i >= 0]
+    if not debuts:
+        raise JSONRepairError("Aucun objet JSON dans la réponse")
+    return texte[min(debuts):].strip()
+
+
+def _fermetures(pile: list) -> str:
+    return "".join("}" if c == "{" else "]" for c in reversed(pile))
+
+
+def _analyser(texte: str):
+    """
+    Parcourt le texte hors chaînes : supprime les virgules finales, convertit
+    True/False/None et note les points de coupe sûrs (après une ouverture,
+    avant une virgule, après une fermeture) avec l'état de la pile.
+
+    Retourne (texte nettoyé, pile finale, chaîne ouverte ?, points de coupe).
+    """
+    sortie = []
+    pile = []
+    coupes = []
+    dans_chaine = echappe = False
+    i = 0
+    while i < len(texte):
+        c = texte[i]
+        if dans_chaine:
+            sortie.append(c)
+            if echappe:
+                echappe = False
+            elif c == "\\":
+                echappe = True
+            elif c == '"':
+                dans_chaine = False
+        elif c == '"':
+            dans_chaine = True
+            sortie.append(c)
+        elif c in "{[":
+            pile.append(c)
+            sortie.append(c)
+            coupes.append((len(sortie), list(pile)))
+        elif c in "}]":
+            while sortie and sortie[-1].isspace():
+                sortie.pop()
+            if sortie and sortie[-1] == ",":
+                sortie.pop()
+            if not pile:
+                break
+            pile.pop()
+            sortie.append("}" if c == "}" else "]")
+            coupes.append((len(sortie), list(pile)))
+            if not pile:
+                break
+        elif c == ",":
+            coupes.append((len(sortie), list(pile)))
+            sortie.append(c)
+        elif c.isalpha():
+            mot = re.match(r"\w+", texte[i:]).group(0)
+            sortie.append(_LITTERAUX_PYTHON.get(mot, mot))
+            i += len(mot)
+            continue
+        else:
+            sortie.append(c)
+        i += 1
+    if echappe:
+        sortie.pop()  # échappement coupé en plein milieu
+    return "".join(sortie), pile, dans_chaine, coupes
+
+
+def repair_json(texte: str) -> str:
+    """
+    Répare localement une réponse JSON tronquée ou légèrement invalide
+    (balises markdown, texte autour, virgules finales, littéraux Python,
+    chaînes et crochets non fermés). La réponse tronquée est coupée au
+    dernier élément complet. Lève JSONRepairError si rien n'est récupérable.
+    """
+    bloc = _extraire_bloc(texte)
+    nettoye, pile, dans_chaine, coupes = _analyser(bloc)
+
+    candidats = []
+    if dans_chaine:
+        candidats.append(nettoye + '"' + _fermetures(pile))
+    candidats.append(nettoye + _fermetures(pile))
+    for position, pile_coupe in reversed(coupes):
+        candidats.append(nettoye[:position].rstrip().rstrip(",") + _fermetures(pile_coupe))
+
+    for candidat in candidats:
+        try:
+            json.loads(candidat, strict=False)
+        except ValueError:
+            continue
+        return candidat
+    raise JSONRepairError("Réponse JSON irrécupérable")
+
+
+def parse_json(texte: str):
+    """
+    Décode la réponse d'un LLM ; retourne (données, réparé ?).
+    Le texte n'est réparé que si le décodage direct échoue.
+    """
+    try:
+        return json.loads(_extraire_bloc(texte), strict=False), False
+    except ValueError:
+        pass
+    return json.loads(repair_json(texte), strict=False), True
+
+
+def _valeur_defaut(schema: dict):
+    type_ = schema.get("type")
+    if type_ == "object":
+        return conform({}, schema)
+    if type_ == "array":
+        return []
+    if type_ in ("number", "integer"):
+        return 0
+    if type_ == "boolean":
+        return False
+    return ""
+
+
+def conform(donnees, schema: dict):
+    """
+    Aligne les données sur le schéma : clés manquantes complétées par une
+    valeur vide du bon type, types simples convertis lorsque possible.
+    Les clés non décrites par le schéma sont conservées.
+    """
+    if not schema:
+        return donnees
+    type_ = schema.get("type")
+    if donnees is None:
+        return _valeur_defaut(schema)
+
+    if type_ == "object":
+        if not isinstance(donnees, dict):
+            return _valeur_defaut(schema)
+        resultat = dict(donnees)
+        for nom, sous_schema in schema.get("properties", {}).items():
+            resultat[nom] = conform(donnees.get(nom), sous_schema)
+        return resultat
+    if type_ == "array":
+        if not isinstance(donnees, list):
+            donnees = [donnees]
+        items = schema.get("items")
+        return [conform(element, items) for element in donnees] if items else donnees
+    if type_ == "string":
+        return donnees if isinstance(donnees, str) else str(donnees)
+    if type_ in ("number", "integer"):
+        try:
+            nombre = float(str(donnees).replace(",", ".").replace(" ", ""))
+        except ValueError:
+            return 0
+        return int(nombre) if type_ == "integer" else nombre
+    if type_ == "boolean":
+        return donnees if isinstance(donnees, bool) else str(donnees).lower() in ("true", "oui", "1")
+    return donnees
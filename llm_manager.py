@@ -1,94 +1,1280 @@
 """
-Gestion des fournisseurs LLM (Gemini, Groq)
+Gestion des fournisseurs LLM (Gemini, Groq, Anthropic)
 """
+import asyncio
+import json
+import queue
+import threading
+import time
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
 import streamlit as st
 import google.generativeai as genai
+import anthropic
 import requests
+from requests.adapters import HTTPAdapter
+import httpx
 import config
+from llm_budget import count_tokens
+from llm_cache import LLMCache, make_cache_key
+from llm_health import CircuitOpenError, get_health, health_snapshot, rank_providers
+from llm_json import JSONRepairError, conform, gemini_schema, parse_json
+from llm_prefix import get_prefix_stub
+from llm_replay import FixtureStore, ReplayClient
+from llm_ratelimit import RateLimitExceeded, get_limiter, rate_limit_snapshot, retry_after_seconds
+from llm_singleflight import flight_key, get_singleflight
+from llm_telemetry import call_event, get_recorder, new_attempt
+
+
+TEMPERATURE = 0.3
+DEFAULT_MAX_TOKENS = 2000
+INTERRUPTED_ERROR = "Appel LLM interrompu avant la réponse. Veuillez réessayer."
+
+# Erreurs d'accès au service, seules (avec les réponses 5xx) comptées comme pannes par le disjoncteur
+_TIMEOUT_ERRORS = (requests.exceptions.Timeout, httpx.TimeoutException, asyncio.TimeoutError,
+                   anthropic.APITimeoutError)
+_CONNECTION_ERRORS = (requests.exceptions.ConnectionError, httpx.TransportError, anthropic.APIConnectionError)
+
+_hedge_executor = None
+_hedge_executor_lock = threading.Lock()
+
+
+def _get_hedge_executor() -> ThreadPoolExecutor:
+    """Pool de threads partagé par le mode « hedged » (créé au premier usage)"""
+    global _hedge_executor
+    with _hedge_executor_lock:
+        if _hedge_executor is None:
+            _hedge_executor = ThreadPoolExecutor(
+                max_workers=config.LLM_HEDGE_MAX_WORKERS,
+                thread_name_prefix="llm-hedge"
+            )
+        return _hedge_executor
+
+
+def build_http_session(pool_size: int = None, http2: bool = None):
+    """
+    Crée une session HTTP keep-alive avec un pool de connexions.
+    
+    HTTP/2 n'étant pas supporté par requests, http2=True retourne un
+    httpx.Client (même interface post/raise_for_status/json) ; le paquet
+    `h2` doit alors être installé, sinon on revient à requests.
+    """
+    pool_size = pool_size or config.LLM_HTTP_POOL_SIZE
+    if config.LLM_HTTP2 if http2 is None else http2:
+        try:
+            return httpx.Client(
+                http2=True,
+                limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+            )
+        except ImportError:
+            st.warning("⚠️ HTTP/2 indisponible (paquet h2 manquant), utilisation de HTTP/1.1")
+    
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _iter_sse_data(session, url: str, headers: dict, payload: dict, timeout: float):
+    """Itère sur les champs `data:` d'une réponse Server-Sent Events (requests ou httpx)"""
+    if isinstance(session, httpx.Client):
+        with session.stream("POST", url, headers=headers, json=payload, timeout=timeout) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if line.startswith("data:"):
+                    yield line[5:].strip()
+        return
+    
+    with session.post(url, headers=headers, json=payload, timeout=timeout, stream=True) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            line = line.decode("utf-8")
+            if line.startswith("data:"):
+                yield line[5:].strip()
+
+
+# Un client HTTP asynchrone (pool de connexions) par boucle d'événements
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _new_async_client() -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=config.LLM_HTTP_POOL_SIZE,
+        max_keepalive_connections=config.LLM_HTTP_POOL_SIZE
+    )
+    if config.LLM_HTTP2:
+        try:
+            return httpx.AsyncClient(http2=True, limits=limits)
+        except ImportError:
+            pass
+    return httpx.AsyncClient(limits=limits)
+
+
+def _get_async_client() -> httpx.AsyncClient:
+    """Retourne le client httpx partagé de la boucle d'événements courante"""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = _new_async_client()
+        _async_clients[loop] = client
+    return client
+
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _get_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    Boucle d'événements unique du processus, dans un thread dédié. Les clients
+    asynchrones mis en cache par les SDK (gRPC de Gemini, httpx) restent liés à
+    la boucle qui les a créés : une boucle par appel (asyncio.run) les rendrait
+    inutilisables dès le deuxième lot.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="llm-async", daemon=True).start()
+        return _loop
+
+
+def submit_async(coro) -> Future:
+    """Planifie une coroutine LLM sur la boucle partagée ; retourne un concurrent.futures.Future"""
+    return asyncio.run_coroutine_threadsafe(coro, _get_event_loop())
 
 
 class LLMManager:
     def __init__(self):
-        self.providers = []
-        self._init_providers()
+        self._providers = None
+        self._routed_providers = {}
+        self._lock = threading.Lock()
+        self.cache = None
+        self._init_cache()
+        # Mode "record" : chaque réponse réelle est aussi écrite dans le répertoire de rejeu
+        self.fixtures = FixtureStore(config.LLM_REPLAY_DIR) if config.LLM_REPLAY_MODE == "record" else None
+    
+    @property
+    def providers(self) -> list:
+        """Fournisseurs configurés, déterminés au premier usage"""
+        if self._providers is None:
+            with self._lock:
+                if self._providers is None:
+                    self._providers = self._init_providers()
+        return self._providers
+    
+    def _init_providers(self) -> list:
+        """
+        Décrit les fournisseurs LLM avec Gemini en priorité.
+        Les clients (SDK, sessions HTTP) ne sont créés qu'au premier appel.
+        En mode "replay", seul le fournisseur de rejeu est utilisé (aucune clé requise).
+        """
+        if config.LLM_REPLAY_MODE == "replay":
+            return [{"name": "Rejeu", "type": "replay", "model": "replay"}]
+        
+        providers = [
+            self._make_provider(provider_type, model)
+            for provider_type, model in (
+                ("gemini", "gemini-2.0-flash-exp"),
+                ("groq", "llama-3.3-70b-versatile"),
+                ("anthropic", "claude-sonnet-4-20250514")
+            )
+            if self._api_key(provider_type)
+        ]
+        
+        if not providers:
+            st.error("❌ Aucun LLM configuré ! Ajoutez GEMINI_API_KEY, GROQ_API_KEY ou ANTHROPIC_API_KEY dans .env")
+            st.stop()
+        return providers
+    
+    @staticmethod
+    def _api_key(provider_type: str):
+        return {
+            "gemini": config.GEMINI_API_KEY,
+            "groq": config.GROQ_API_KEY,
+            "anthropic": config.ANTHROPIC_API_KEY
+        }.get(provider_type)
+    
+    @classmethod
+    def _make_provider(cls, provider_type: str, model: str) -> dict:
+        provider = {
+            "name": config.LLM_MODEL_NAMES.get(model, f"{provider_type} {model}"),
+            "type": provider_type,
+            "model": model
+        }
+        if provider_type in ("groq", "anthropic"):
+            provider["api_key"] = cls._api_key(provider_type)
+        return provider
+    
+    def _provider(self, provider_type: str, model: str) -> dict:
+        """Fournisseur d'un modèle donné (celui par défaut s'il existe, sinon créé au premier usage)"""
+        for provider in self.providers:
+            if provider["type"] == provider_type and provider["model"] == model:
+                return provider
+        with self._lock:
+            provider = self._routed_providers.get((provider_type, model))
+            if provider is None:
+                provider = self._routed_providers[(provider_type, model)] = self._make_provider(provider_type, model)
+        return provider
+    
+    def _route_providers(self, task: str) -> list:
+        """Chaîne de repli configurée pour la tâche (modèles dont la clé est définie), sinon []"""
+        route = config.LLM_TASK_ROUTES.get(task)
+        if not route or config.LLM_REPLAY_MODE == "replay":
+            return []
+        return [
+            self._provider(provider_type, model)
+            for provider_type, model in route["chain"] if self._api_key(provider_type)
+        ]
+    
+    def _client(self, provider: dict):
+        """Client du fournisseur (modèle Gemini, session HTTP ou SDK Anthropic), créé au premier usage"""
+        client = provider.get("client")
+        if client is None:
+            with self._lock:
+                client = provider.get("client")
+                if client is None:
+                    client = provider["client"] = self._create_client(provider)
+        return client
+    
+    @staticmethod
+    def _create_client(provider: dict):
+        if provider["type"] == "gemini":
+            genai.configure(api_key=config.GEMINI_API_KEY)
+            return genai.GenerativeModel(provider["model"])
+        if provider["type"] == "groq":
+            return build_http_session()
+        if provider["type"] == "anthropic":
+            # Pool httpx keep-alive dimensionné comme les autres ; le fallback gère les reprises
+            return anthropic.Anthropic(
+                api_key=provider["api_key"],
+                max_retries=0,
+                timeout=config.LLM_ANTHROPIC_TIMEOUT_SECONDS,
+                http_client=httpx.Client(limits=httpx.Limits(
+                    max_connections=config.LLM_HTTP_POOL_SIZE,
+                    max_keepalive_connections=config.LLM_HTTP_POOL_SIZE
+                ))
+            )
+        if provider["type"] == "replay":
+            return ReplayClient(FixtureStore(config.LLM_REPLAY_DIR))
+        raise ValueError(f"Type de fournisseur inconnu : {provider['type']}")
+    
+    def _init_cache(self):
+        """Ouvre le cache disque des réponses si activé"""
+        if not config.LLM_CACHE_ENABLED:
+            return
+        try:
+            self.cache = LLMCache(
+                config.LLM_CACHE_PATH,
+                max_entries=config.LLM_CACHE_MAX_ENTRIES,
+                max_bytes=config.LLM_CACHE_MAX_BYTES,
+                ttl_seconds=config.LLM_CACHE_TTL_SECONDS
+            )
+        except Exception as e:
+            st.warning(f"⚠️ Cache LLM non disponible : {str(e)[:100]}")
+    
+    @staticmethod
+    def _build_request(prompt: str, max_tokens: int = None, json_mode: bool = False, schema: dict = None,
+                       task: str = None, prefix: str = None, max_queue_wait: float = None) -> dict:
+        """
+        Paramètres d'un appel, transmis tels quels à travers fallback, hedging et cache.
+        "prompt" est le prompt complet (préfixe stable + partie variable).
+        Sans `max_tokens`, la valeur de la route de la tâche s'applique ; "timeout"
+        vient aussi de la route (None : délai par défaut du fournisseur).
+        "max_queue_wait" borne l'attente dans la file du limiteur (None : valeur du limiteur).
+        "attempts" reçoit les mesures de chaque tentative (télémétrie).
+        """
+        route = config.LLM_TASK_ROUTES.get(task, {})
+        return {
+            "prompt": (prefix or "") + prompt,
+            "prefix": prefix,
+            "prefix_hit": None,
+            "max_tokens": max_tokens or route.get("max_tokens", DEFAULT_MAX_TOKENS),
+            "timeout": route.get("timeout"),
+            "max_queue_wait": max_queue_wait,
+            "json": json_mode or schema is not None,
+            "schema": schema,
+            "task": task,
+            "attempts": []
+        }
+    
+    @staticmethod
+    def _observe_prefix(request: dict):
+        """Vérifie localement que le préfixe serait réutilisable par le cache du fournisseur"""
+        if request["prefix"]:
+            request["prefix_hit"] = get_prefix_stub().observe(request["task"] or "general", request["prefix"])
+    
+    def _cache_key(self, provider: dict, request: dict) -> str:
+        params = {"max_tokens": request["max_tokens"], "temperature": TEMPERATURE}
+        if request["json"]:
+            params["json"] = request["schema"] or True
+        return make_cache_key(request["prompt"], provider["type"], provider["model"], params)
+    
+    def _cache_get(self, request: dict):
+        """
+        Cherche une réponse en cache pour l'un des fournisseurs qui pourraient
+        répondre à la requête (chaîne de la route de sa tâche), dans l'ordre de priorité
+        """
+        cached = None
+        try:
+            for provider in self._ordered_providers(request=request):
+                cached = self.cache.get(self._cache_key(provider, request), count=False)
+                if cached:
+                    break
+            self.cache.record_lookup(cached is not None)
+        except Exception:
+            return None
+        return cached
+    
+    def _cache_set(self, provider: dict, request: dict, result: str):
+        try:
+            self.cache.set(self._cache_key(provider, request), provider["name"], result)
+        except Exception:
+            pass
+    
+    def cache_stats(self) -> dict:
+        """Compteurs du cache (hits, misses, appels payants évités)"""
+        return self.cache.stats() if self.cache else {}
+    
+    @staticmethod
+    def provider_health() -> list:
+        """État des disjoncteurs et statistiques glissantes des fournisseurs sollicités (routes comprises)"""
+        return health_snapshot()
+    
+    @staticmethod
+    def rate_limit_metrics() -> list:
+        """Profondeur de file, temps d'attente et 429 par fournisseur sollicité (routes comprises)"""
+        return rate_limit_snapshot()
+    
+    @staticmethod
+    def export_telemetry(fmt: str = "jsonl") -> str:
+        """Télémétrie des appels : "jsonl" (derniers appels) ou "prometheus" (compteurs cumulés)"""
+        recorder = get_recorder()
+        return recorder.to_prometheus() if fmt == "prometheus" else recorder.to_jsonl()
+    
+    @staticmethod
+    def prefix_cache_stats() -> list:
+        """Stabilité des préfixes par tâche (succès qu'obtiendrait le cache de préfixe des fournisseurs)"""
+        return get_prefix_stub().stats()
+    
+    @staticmethod
+    def telemetry_summary() -> list:
+        """Appels, durée moyenne, tokens et coût par tâche, du plus coûteux au moins coûteux"""
+        return get_recorder().summary()
+    
+    @staticmethod
+    def singleflight_stats() -> dict:
+        """Appels identiques en cours, appels effectués et appels regroupés sur un appel en cours"""
+        return get_singleflight().stats()
+    
+    @staticmethod
+    def _record_call(request: dict, response: dict, start: float, cache_hit: bool = False,
+                     coalesced: bool = False):
+        get_recorder().record(call_event(request, response, time.monotonic() - start, cache_hit, coalesced))
+    
+    @staticmethod
+    def _join_flight(request: dict) -> tuple:
+        """
+        Rejoint un appel identique déjà en cours dans le processus.
+        Retourne (future, meneur) ; sans regroupement, chaque appel est son propre meneur.
+        """
+        if not config.LLM_SINGLEFLIGHT_ENABLED:
+            return None, True
+        request["flight_key"] = flight_key(request)
+        return get_singleflight().begin(request["flight_key"])
+    
+    @staticmethod
+    def _land_flight(request: dict, flight, response: dict):
+        """Transmet la réponse du meneur aux appels regroupés"""
+        if flight is not None:
+            get_singleflight().finish(request["flight_key"], flight, response)
+    
+    def _save_fixture(self, provider: dict, request: dict, result: str, measures: dict):
+        """Enregistre la réponse pour le rejeu (mode "record") sans jamais faire échouer l'appel"""
+        if self.fixtures is None or provider["type"] == "replay":
+            return
+        try:
+            self.fixtures.save(request, provider, result, measures)
+        except OSError as e:
+            st.warning(f"⚠️ Enregistrement de la réponse impossible : {str(e)[:100]}")
+    
+    @staticmethod
+    def _replay_result(fixture: dict, measures: dict) -> str:
+        """Reporte les tokens et le modèle d'origine d'une réponse rejouée (coûts réalistes)"""
+        measures.update(
+            model=fixture.get("model") or measures["model"],
+            input_tokens=fixture.get("input_tokens"),
+            output_tokens=fixture.get("output_tokens")
+        )
+        return fixture["result"]
+    
+    @staticmethod
+    def _record_usage(attempt: dict, provider_type: str, payload):
+        """Reporte les tokens d'entrée/sortie annoncés par l'API dans les mesures de la tentative"""
+        if provider_type == "groq":
+            usage = payload.get("usage") or (payload.get("x_groq") or {}).get("usage") or {}
+            attempt["input_tokens"] = usage.get("prompt_tokens", attempt["input_tokens"])
+            attempt["output_tokens"] = usage.get("completion_tokens", attempt["output_tokens"])
+            cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens")
+            if cached:
+                attempt["cached_input_tokens"] = cached
+        elif provider_type == "gemini":
+            usage = getattr(payload, "usage_metadata", None)
+            if usage and usage.prompt_token_count:
+                attempt["input_tokens"] = usage.prompt_token_count
+                attempt["output_tokens"] = usage.candidates_token_count
+                attempt["cached_input_tokens"] = getattr(usage, "cached_content_token_count", 0) or 0
+        elif provider_type == "anthropic":
+            usage = getattr(payload, "usage", None)
+            if usage is not None:
+                # input_tokens n'inclut pas les tokens lus ou écrits dans le cache de prompt
+                cache_read = getattr(usage, "cache_read_input_tokens", None) or 0
+                cache_write = getattr(usage, "cache_creation_input_tokens", None) or 0
+                attempt["input_tokens"] = usage.input_tokens + cache_read + cache_write
+                attempt["cached_input_tokens"] = cache_read
+                attempt["output_tokens"] = usage.output_tokens
+    
+    @staticmethod
+    def _groq_headers(provider: dict) -> dict:
+        return {
+            "Authorization": f"Bearer {provider['api_key']}",
+            "Content-Type": "application/json"
+        }
+    
+    @staticmethod
+    def _groq_payload(provider: dict, request: dict) -> dict:
+        payload = {
+            "model": provider["model"],
+            "messages": [{"role": "user", "content": request["prompt"]}],
+            "max_tokens": request["max_tokens"],
+            "temperature": TEMPERATURE
+        }
+        if request["json"]:
+            # Groq n'accepte pas de schéma pour ce modèle : JSON valide garanti, structure vérifiée localement
+            payload["response_format"] = {"type": "json_object"}
+        return payload
+    
+    @staticmethod
+    def _anthropic_prefill(request: dict) -> str:
+        """Début de réponse imposé à Claude en mode JSON (pas de mode JSON natif)"""
+        return "{" if request["json"] else ""
+    
+    @classmethod
+    def _anthropic_kwargs(cls, provider: dict, request: dict) -> dict:
+        content = request["prompt"]
+        if request["prefix"]:
+            # Préfixe stable marqué pour le cache de prompt (lu ensuite à ~10 % du tarif d'entrée)
+            content = [
+                {"type": "text", "text": request["prefix"], "cache_control": {"type": "ephemeral"}},
+                {"type": "text", "text": request["prompt"][len(request["prefix"]):]}
+            ]
+        messages = [{"role": "user", "content": content}]
+        if cls._anthropic_prefill(request):
+            messages.append({"role": "assistant", "content": cls._anthropic_prefill(request)})
+        kwargs = {
+            "model": provider["model"],
+            "max_tokens": request["max_tokens"],
+            "temperature": TEMPERATURE,
+            "messages": messages
+        }
+        if request["timeout"]:
+            kwargs["timeout"] = request["timeout"]
+        return kwargs
+    
+    @staticmethod
+    def _gemini_kwargs(request: dict) -> dict:
+        generation_config = {"max_output_tokens": request["max_tokens"], "temperature": TEMPERATURE}
+        if request["json"]:
+            generation_config["response_mime_type"] = "application/json"
+            if request["schema"]:
+                generation_config["response_schema"] = gemini_schema(request["schema"])
+        return {
+            "generation_config": generation_config,
+            "request_options": {"timeout": request["timeout"] or config.LLM_GEMINI_TIMEOUT_SECONDS}
+        }
+    
+    @staticmethod
+    def _circuit_open(provider: dict) -> CircuitOpenError:
+        return CircuitOpenError(f"Service {provider['name']} temporairement écarté (disjoncteur ouvert)")
+    
+    @staticmethod
+    def _is_outage(error: Exception) -> bool:
+        """
+        Panne du fournisseur (délai dépassé, connexion impossible, réponse 5xx).
+        Les autres erreurs (400, contexte trop long, réponse bloquée, fixture
+        absente) tiennent à la requête : elles n'ouvrent pas le disjoncteur.
+        """
+        if isinstance(error, _TIMEOUT_ERRORS + _CONNECTION_ERRORS):
+            return True
+        response = getattr(error, "response", None)
+        status = (getattr(error, "status_code", None) or getattr(response, "status_code", None)
+                  or getattr(error, "code", None))
+        return isinstance(status, int) and status >= 500
+    
+    @staticmethod
+    def _throttled(provider: dict, error: Exception, attempt: int) -> bool:
+        """
+        Traite une réponse 429 : bloque le limiteur pendant Retry-After et indique
+        si l'appel doit être retenté (une seule fois, si l'attente reste acceptable).
+        """
+        retry_after = retry_after_seconds(error)
+        if retry_after is None:
+            return False
+        get_limiter(provider).penalize(retry_after)
+        return attempt == 0 and retry_after <= config.LLM_RATE_LIMIT_MAX_WAIT_SECONDS
     
-    def _init_providers(self):
-        """Initialise les fournisseurs LLM avec Gemini en priorité"""
-        if config.GEMINI_API_KEY:
+    def _call_provider(self, provider: dict, request: dict) -> str:
+        """
+        Appelle un fournisseur en respectant son disjoncteur et son quota
+        (file d'attente partagée), et en mesurant sa santé.
+        """
+        health = get_health(provider["name"])
+        limiter = get_limiter(provider)
+        measures = new_attempt(provider)
+        request["attempts"].append(measures)
+        for attempt in range(2):
+            if not health.breaker.is_available():
+                raise self._circuit_open(provider)
+            measures["queue_wait"] += limiter.acquire(
+                limiter.estimate(request["prompt"], request["max_tokens"]), request["max_queue_wait"]
+            )
+            if not health.breaker.try_acquire():
+                raise self._circuit_open(provider)
+            start = time.monotonic()
             try:
-                genai.configure(api_key=config.GEMINI_API_KEY)
-                model = genai.GenerativeModel('gemini-2.0-flash-exp')
-                self.providers.append({
-                    "name": "Gemini 2.0 Flash",
-                    "client": model,
-                    "type": "gemini"
-                })
+                result = self._request_provider(provider, request, measures)
             except Exception as e:
-                st.warning(f"⚠️ Gemini non disponible : {str(e)[:100]}")
+                measures["latency"] = time.monotonic() - start
+                if retry_after_seconds(e) is not None:
+                    # Limitation de débit : ni succès ni panne pour le disjoncteur
+                    health.breaker.release()
+                    if self._throttled(provider, e, attempt):
+                        continue
+                    raise
+                if self._is_outage(e):
+                    health.record(False, measures["latency"])
+                else:
+                    health.breaker.release()
+                raise
+            measures.update(ok=True, latency=time.monotonic() - start)
+            health.record(True, measures["latency"])
+            limiter.record_output(measures["output_tokens"])
+            self._save_fixture(provider, request, result, measures)
+            return result
+    
+    def _request_provider(self, provider: dict, request: dict, measures: dict) -> str:
+        """Appelle un fournisseur et retourne le texte généré (tokens reportés dans `measures`)"""
+        if provider["type"] == "groq":
+            response = self._client(provider).post(
+                config.GROQ_API_URL,
+                headers=self._groq_headers(provider),
+                json=self._groq_payload(provider, request),
+                timeout=request["timeout"] or 30
+            )
+            if isinstance(response, requests.Response):
+                # requests mesure le délai jusqu'à la réception des en-têtes
+                measures["ttfb"] = response.elapsed.total_seconds()
+            response.raise_for_status()
+            data = response.json()
+            self._record_usage(measures, "groq", data)
+            return data["choices"][0]["message"]["content"]
+        elif provider["type"] == "gemini":
+            response = self._client(provider).generate_content(request["prompt"], **self._gemini_kwargs(request))
+            self._record_usage(measures, "gemini", response)
+            return response.text
+        elif provider["type"] == "anthropic":
+            message = self._client(provider).messages.create(
+                **self._anthropic_kwargs(provider, request)
+            )
+            self._record_usage(measures, "anthropic", message)
+            return self._anthropic_prefill(request) + "".join(
+                block.text for block in message.content if block.type == "text"
+            )
+        elif provider["type"] == "replay":
+            return self._replay_result(self._client(provider).complete(request), measures)
+        raise ValueError(f"Type de fournisseur inconnu : {provider['type']}")
+    
+    def _stream_provider(self, provider: dict, request: dict, measures: dict):
+        """Générateur des fragments de texte d'un fournisseur (Gemini stream=True, Groq SSE)"""
+        if provider["type"] == "groq":
+            payload = dict(self._groq_payload(provider, request), stream=True)
+            for data in _iter_sse_data(self._client(provider), config.GROQ_API_URL,
+                                       self._groq_headers(provider), payload, timeout=request["timeout"] or 30):
+                if data == "[DONE]":
+                    break
+                event = json.loads(data)
+                self._record_usage(measures, "groq", event)
+                delta = event["choices"][0].get("delta", {}).get("content") if event.get("choices") else None
+                if delta:
+                    yield delta
+        elif provider["type"] == "gemini":
+            response = self._client(provider).generate_content(
+                request["prompt"], stream=True, **self._gemini_kwargs(request)
+            )
+            for chunk in response:
+                self._record_usage(measures, "gemini", chunk)
+                if chunk.text:
+                    yield chunk.text
+        elif provider["type"] == "anthropic":
+            with self._client(provider).messages.stream(
+                **self._anthropic_kwargs(provider, request)
+            ) as stream:
+                if self._anthropic_prefill(request):
+                    yield self._anthropic_prefill(request)
+                for text in stream.text_stream:
+                    yield text
+                self._record_usage(measures, "anthropic", stream.get_final_message())
+        elif provider["type"] == "replay":
+            result = self._replay_result(self._client(provider).complete(request), measures)
+            for i in range(0, len(result), 40):
+                yield result[i:i + 40]
+        else:
+            raise ValueError(f"Type de fournisseur inconnu : {provider['type']}")
+    
+    async def _acall_provider(self, provider: dict, request: dict) -> str:
+        """Version asynchrone de _call_provider"""
+        health = get_health(provider["name"])
+        limiter = get_limiter(provider)
+        measures = new_attempt(provider)
+        request["attempts"].append(measures)
+        for attempt in range(2):
+            if not health.breaker.is_available():
+                raise self._circuit_open(provider)
+            measures["queue_wait"] += await asyncio.to_thread(
+                limiter.acquire, limiter.estimate(request["prompt"], request["max_tokens"]), request["max_queue_wait"]
+            )
+            if not health.breaker.try_acquire():
+                raise self._circuit_open(provider)
+            start = time.monotonic()
+            try:
+                result = await self._arequest_provider(provider, request, measures)
+            except asyncio.CancelledError:
+                health.breaker.release()
+                raise
+            except Exception as e:
+                measures["latency"] = time.monotonic() - start
+                if retry_after_seconds(e) is not None:
+                    health.breaker.release()
+                    if self._throttled(provider, e, attempt):
+                        continue
+                    raise
+                if self._is_outage(e):
+                    health.record(False, measures["latency"])
+                else:
+                    health.breaker.release()
+                raise
+            measures.update(ok=True, latency=time.monotonic() - start)
+            health.record(True, measures["latency"])
+            limiter.record_output(measures["output_tokens"])
+            self._save_fixture(provider, request, result, measures)
+            return result
+    
+    async def _arequest_provider(self, provider: dict, request: dict, measures: dict) -> str:
+        """Version asynchrone de _request_provider (client httpx partagé)"""
+        if provider["type"] == "groq":
+            response = await _get_async_client().post(
+                config.GROQ_API_URL,
+                headers=self._groq_headers(provider),
+                json=self._groq_payload(provider, request),
+                timeout=request["timeout"] or 30
+            )
+            response.raise_for_status()
+            data = response.json()
+            self._record_usage(measures, "groq", data)
+            return data["choices"][0]["message"]["content"]
+        elif provider["type"] == "gemini":
+            response = await self._client(provider).generate_content_async(request["prompt"], **self._gemini_kwargs(request))
+            self._record_usage(measures, "gemini", response)
+            return response.text
+        elif provider["type"] == "anthropic":
+            # Client asynchrone léger branché sur le pool httpx de la boucle courante
+            client = anthropic.AsyncAnthropic(
+                api_key=provider["api_key"],
+                max_retries=0,
+                timeout=config.LLM_ANTHROPIC_TIMEOUT_SECONDS,
+                http_client=_get_async_client()
+            )
+            message = await client.messages.create(**self._anthropic_kwargs(provider, request))
+            self._record_usage(measures, "anthropic", message)
+            return self._anthropic_prefill(request) + "".join(
+                block.text for block in message.content if block.type == "text"
+            )
+        elif provider["type"] == "replay":
+            return self._replay_result(await self._client(provider).acomplete(request), measures)
+        raise ValueError(f"Type de fournisseur inconnu : {provider['type']}")
+    
+    @staticmethod
+    def _success(provider_name: str, result: str) -> dict:
+        return {
+            "success": True,
+            "result": result,
+            "provider": provider_name,
+            "error": None
+        }
+    
+    @staticmethod
+    def _failure(last_error) -> dict:
+        return {
+            "success": False,
+            "result": None,
+            "provider": None,
+            "error": last_error or "Tous les services d'IA sont indisponibles. Veuillez réessayer plus tard."
+        }
+    
+    @staticmethod
+    def _error_message(provider: dict, error: Exception) -> str:
+        if isinstance(error, (CircuitOpenError, RateLimitExceeded)):
+            return str(error)
+        if retry_after_seconds(error) is not None:
+            return f"Le service {provider['name']} a atteint sa limite de requêtes, réessayez sous peu"
+        if isinstance(error, _TIMEOUT_ERRORS):
+            return f"Le service {provider['name']} a mis trop de temps à répondre"
+        if isinstance(error, _CONNECTION_ERRORS):
+            return f"Impossible de se connecter au service {provider['name']}"
+        return f"Erreur avec {provider['name']}: {str(error)[:100]}"
+    
+    @staticmethod
+    def _call_limit(provider: dict) -> int:
+        """Tokens maximum d'un appel (entrée + sortie) : fenêtre de contexte et quota par minute"""
+        window = config.LLM_CONTEXT_WINDOWS.get(provider["model"], 8192)
+        tpm = config.LLM_RATE_LIMITS.get(provider["type"], {}).get("tpm", window)
+        return min(window, tpm)
+    
+    def _fits(self, provider: dict, request: dict) -> bool:
+        return count_tokens(request["prompt"], provider["type"]) + request["max_tokens"] <= self._call_limit(provider)
+    
+    def input_budget(self, max_tokens: int = None, prefer: str = None, task: str = None) -> tuple:
+        """
+        Budget de tokens d'entrée d'un prompt (fenêtre de contexte et quota, moins
+        la sortie et une marge, plafonné par LLM_PROMPT_MAX_INPUT_TOKENS).
+        Le prompt doit tenir chez le premier modèle sollicité et chez au moins un
+        modèle de repli (le plus large de la chaîne), pour qu'une panne du premier
+        ne laisse pas la requête sans fournisseur.
+        Retourne (budget, type du fournisseur limitant) pour compter les tokens
+        avec le ratio de ce fournisseur.
+        """
+        providers = self._ordered_providers(prefer, task=task)
+        provider = providers[0]
+        if len(providers) > 1:
+            repli = max(providers[1:], key=self._call_limit)
+            if self._call_limit(repli) < self._call_limit(provider):
+                provider = repli
+        max_tokens = max_tokens or config.LLM_TASK_ROUTES.get(task, {}).get("max_tokens", DEFAULT_MAX_TOKENS)
+        budget = self._call_limit(provider) - max_tokens - config.LLM_PROMPT_SAFETY_MARGIN_TOKENS
+        return max(0, min(budget, config.LLM_PROMPT_MAX_INPUT_TOKENS)), provider["type"]
+    
+    def _ordered_providers(self, prefer: str = None, request: dict = None, task: str = None) -> list:
+        """
+        Fournisseurs classés selon leur santé ; `prefer` (type) passe en tête s'il est disponible.
+        Une tâche routée (config.LLM_TASK_ROUTES) classe de même sa chaîne de repli, dont
+        l'ordre configuré départage les fournisseurs de santé égale ou encore peu mesurés.
+        Les fournisseurs au circuit ouvert passent en dernier.
+        Avec `request`, les fournisseurs dont la limite ne peut contenir le prompt sont écartés
+        (sauf si aucun ne convient : l'appel est alors tenté tel quel).
+        """
+        chain = self._route_providers(request["task"] if request is not None else task) or self.providers
+        providers = rank_providers(chain)
+        providers += [p for p in chain if p not in providers]
+        if prefer:
+            providers.sort(key=lambda p: p["type"] != prefer)
+        if request is not None:
+            fitting = [p for p in providers if self._fits(p, request)]
+            return fitting or providers
+        return providers
+    
+    def analyze(self, prompt: str, max_tokens: int = None, use_cache: bool = True,
+                hedged: bool = None, prefer: str = None, json_mode: bool = False,
+                schema: dict = None, task: str = None, prefix: str = None) -> dict:
+        """
+        Analyse un prompt avec fallback automatique entre les LLMs.
         
-        if config.GROQ_API_KEY:
-            self.providers.append({
-                "name": "Groq LLaMA 3.3 70B",
-                "api_key": config.GROQ_API_KEY,
-                "type": "groq"
-            })
+        use_cache=False contourne la lecture du cache (régénération forcée) ;
+        la nouvelle réponse remplace alors l'entrée existante.
+        hedged=True active les requêtes parallèles différées (défaut : config.LLM_HEDGE_ENABLED).
+        prefer="anthropic" (ou "gemini", "groq") essaie d'abord ce type de fournisseur.
+        json_mode=True (ou un `schema`) active le mode JSON natif des fournisseurs ;
+        voir analyze_json pour obtenir directement les données décodées.
+        task ("prequalification", "exigences", ...) étiquette l'appel dans la télémétrie et
+        sélectionne sa route : chaîne de modèles, max_tokens (si non fourni) et délai.
+        prefix : partie stable placée avant `prompt` (instructions, profil), mise en
+        cache chez les fournisseurs qui le permettent.
+        """
+        start = time.monotonic()
+        request = self._build_request(prompt, max_tokens, json_mode, schema, task, prefix)
+        if self.cache and use_cache:
+            cached = self._cache_get(request)
+            if cached:
+                provider_name, result = cached
+                response = self._success(provider_name, result)
+                self._record_call(request, response, start, cache_hit=True)
+                return response
         
-        if not self.providers:
-            st.error("❌ Aucun LLM configuré ! Ajoutez GEMINI_API_KEY ou GROQ_API_KEY dans .env")
-            st.stop()
+        flight, leader = self._join_flight(request)
+        if not leader:
+            response = dict(flight.result())
+            self._record_call(request, response, start, coalesced=True)
+            return response
+        
+        response = self._failure(INTERRUPTED_ERROR)
+        try:
+            self._observe_prefix(request)
+            providers = self._ordered_providers(prefer, request)
+            if hedged is None:
+                hedged = config.LLM_HEDGE_ENABLED
+            if hedged and len(providers) > 1:
+                response = self._analyze_hedged(providers, request)
+            else:
+                response = self._analyze_sequential(providers, request)
+        finally:
+            self._land_flight(request, flight, response)
+        self._record_call(request, response, start)
+        return response
     
-    def analyze(self, prompt: str, max_tokens: int = 2000) -> dict:
-        """Analyse un prompt avec fallback automatique entre les LLMs"""
-        last_error = None
+    def analyze_json(self, prompt: str, schema: dict = None, max_tokens: int = None, **kwargs) -> dict:
+        """
+        Analyse en mode JSON structuré.
         
-        for provider in self.providers:
+        Même contrat que analyze(), mais "result" contient les données décodées.
+        Une réponse tronquée ou légèrement invalide est réparée localement
+        plutôt que régénérée ("repaired" vaut alors True) ; avec un `schema`,
+        les clés manquantes sont complétées par des valeurs vides du bon type.
+        """
+        response = self.analyze(prompt, max_tokens=max_tokens, json_mode=True, schema=schema, **kwargs)
+        return self._decode_json(response, schema)
+    
+    def _decode_json(self, response: dict, schema: dict = None) -> dict:
+        if not response["success"]:
+            return dict(response, repaired=False)
+        try:
+            data, repaired = parse_json(response["result"])
+        except (JSONRepairError, ValueError) as e:
+            return dict(self._failure(f"Réponse JSON invalide de {response['provider']} : {str(e)[:100]}"),
+                        repaired=False)
+        return dict(response, result=conform(data, schema) if schema else data, repaired=repaired)
+    
+    def _analyze_sequential(self, providers: list, request: dict, last_error=None) -> dict:
+        """Essaie les fournisseurs l'un après l'autre"""
+        for provider in providers:
             try:
-                if provider["type"] == "groq":
-                    response = requests.post(
-                        "https://api.groq.com/openai/v1/chat/completions",
-                        headers={
-                            "Authorization": f"Bearer {provider['api_key']}",
-                            "Content-Type": "application/json"
-                        },
-                        json={
-                            "model": "llama-3.3-70b-versatile",
-                            "messages": [{"role": "user", "content": prompt}],
-                            "max_tokens": max_tokens,
-                            "temperature": 0.3
-                        },
-                        timeout=30
-                    )
-                    response.raise_for_status()
-                    return {
-                        "success": True,
-                        "result": response.json()["choices"][0]["message"]["content"],
-                        "provider": provider["name"],
-                        "error": None
-                    }
-                elif provider["type"] == "gemini":
-                    response = provider["client"].generate_content(
-                        prompt,
-                        generation_config={"max_output_tokens": max_tokens, "temperature": 0.3}
-                    )
-                    return {
-                        "success": True,
-                        "result": response.text,
-                        "provider": provider["name"],
-                        "error": None
-                    }
-            except requests.exceptions.Timeout:
-                last_error = f"Le service {provider['name']} a mis trop de temps à répondre"
+                result = self._call_provider(provider, request)
+            except Exception as e:
+                last_error = self._error_message(provider, e)
                 continue
-            except requests.exceptions.ConnectionError:
-                last_error = f"Impossible de se connecter au service {provider['name']}"
+            if self.cache:
+                self._cache_set(provider, request, result)
+            return self._success(provider["name"], result)
+        
+        return self._failure(last_error)
+    
+    def _analyze_hedged(self, providers: list, request: dict) -> dict:
+        """
+        Lance le fournisseur principal ; s'il n'a pas répondu après
+        config.LLM_HEDGE_DELAY_SECONDS (≈ p95 de sa latence), lance le
+        secondaire en parallèle et garde la première réponse valide.
+        La requête perdante est annulée si elle n'a pas démarré, sinon ignorée.
+        """
+        executor = _get_hedge_executor()
+        primary, secondary = providers[0], providers[1]
+        last_error = None
+        
+        futures = {executor.submit(self._call_provider, primary, request): primary}
+        done, pending = wait(futures, timeout=config.LLM_HEDGE_DELAY_SECONDS)
+        if not done:
+            future = executor.submit(self._call_provider, secondary, request)
+            futures[future] = secondary
+            pending.add(future)
+        
+        while True:
+            for future in done:
+                provider = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    last_error = self._error_message(provider, e)
+                    if len(futures) == 1:
+                        # Échec rapide du principal : bascule immédiate sur le secondaire
+                        retry = executor.submit(self._call_provider, secondary, request)
+                        futures[retry] = secondary
+                        pending.add(retry)
+                    continue
+                for other in pending:
+                    other.cancel()
+                if self.cache:
+                    self._cache_set(provider, request, result)
+                return self._success(provider["name"], result)
+            
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        
+        return self._analyze_sequential(providers[2:], request, last_error)
+    
+    def analyze_stream(self, prompt: str, max_tokens: int = None, use_cache: bool = True,
+                       meta: dict = None, prefer: str = None, json_mode: bool = False,
+                       task: str = None, prefix: str = None, hedged: bool = None):
+        """
+        Générateur de fragments de texte, à passer à st.write_stream.
+        
+        Bascule sur le fournisseur suivant tant qu'aucun fragment n'a été émis ;
+        le nom du fournisseur retenu est écrit dans meta["provider"].
+        hedged=True (défaut : config.LLM_HEDGE_ENABLED) lance le secondaire si le
+        principal n'a émis aucun fragment après config.LLM_HEDGE_DELAY_SECONDS.
+        Lève RuntimeError si tous les fournisseurs échouent.
+        """
+        meta = meta if meta is not None else {}
+        call_start = time.monotonic()
+        request = self._build_request(prompt, max_tokens, json_mode, task=task, prefix=prefix)
+        if self.cache and use_cache:
+            cached = self._cache_get(request)
+            if cached:
+                meta["provider"], result = cached
+                self._record_call(request, self._success(meta["provider"], result), call_start, cache_hit=True)
+                yield result
+                return
+        
+        flight, leader = self._join_flight(request)
+        if not leader:
+            # Même prompt déjà en cours : sa réponse complète est émise en un seul fragment
+            response = flight.result()
+            self._record_call(request, response, call_start, coalesced=True)
+            if not response["success"]:
+                raise RuntimeError(response["error"])
+            meta["provider"] = response["provider"]
+            yield response["result"]
+            return
+        
+        response = self._failure(INTERRUPTED_ERROR)
+        try:
+            self._observe_prefix(request)
+            providers = self._ordered_providers(prefer, request)
+            if hedged is None:
+                hedged = config.LLM_HEDGE_ENABLED
+            try:
+                if hedged and len(providers) > 1:
+                    provider, result = yield from self._stream_hedged(providers, request)
+                else:
+                    provider, result = yield from self._stream_sequential(providers, request)
+            except RuntimeError as e:
+                response = self._failure(str(e))
+                self._record_call(request, response, call_start)
+                raise
+            meta["provider"] = provider["name"]
+            response = self._success(provider["name"], result)
+            self._record_call(request, response, call_start)
+            if self.cache:
+                self._cache_set(provider, request, result)
+        finally:
+            self._land_flight(request, flight, response)
+    
+    def _stream_attempt(self, provider: dict, request: dict):
+        """
+        Générateur des fragments d'un fournisseur, avec disjoncteur, quota et
+        mesure de santé comme _call_provider (sans nouvel essai après un 429)
+        """
+        health = get_health(provider["name"])
+        limiter = get_limiter(provider)
+        measures = new_attempt(provider)
+        request["attempts"].append(measures)
+        if not health.breaker.is_available():
+            raise self._circuit_open(provider)
+        measures["queue_wait"] = limiter.acquire(limiter.estimate(request["prompt"], request["max_tokens"]))
+        if not health.breaker.try_acquire():
+            raise self._circuit_open(provider)
+        chunks = []
+        start = time.monotonic()
+        try:
+            for chunk in self._stream_provider(provider, request, measures):
+                if not chunks:
+                    measures["ttfb"] = time.monotonic() - start
+                chunks.append(chunk)
+                yield chunk
+        except GeneratorExit:
+            health.breaker.release()
+            raise
+        except Exception as e:
+            measures["latency"] = time.monotonic() - start
+            if retry_after_seconds(e) is not None:
+                health.breaker.release()
+                self._throttled(provider, e, attempt=1)
+            elif self._is_outage(e):
+                health.record(False, measures["latency"])
+            else:
+                health.breaker.release()
+            raise
+        measures.update(ok=True, latency=time.monotonic() - start)
+        health.record(True, measures["latency"])
+        limiter.record_output(measures["output_tokens"])
+        self._save_fixture(provider, request, "".join(chunks), measures)
+    
+    def _stream_sequential(self, providers: list, request: dict, last_error=None):
+        """
+        Émet les fragments du premier fournisseur qui répond, en basculant sur le
+        suivant tant qu'aucun fragment n'a été émis. Retourne (fournisseur, texte).
+        """
+        for provider in providers:
+            chunks = []
+            stream = self._stream_attempt(provider, request)
+            try:
+                for chunk in stream:
+                    chunks.append(chunk)
+                    yield chunk
+            except Exception as e:
+                last_error = self._error_message(provider, e)
+                if chunks:
+                    # Réponse partielle déjà affichée : impossible de basculer proprement
+                    raise RuntimeError(last_error) from e
                 continue
+            finally:
+                stream.close()
+            return provider, "".join(chunks)
+        
+        raise RuntimeError(self._failure(last_error)["error"])
+    
+    def _stream_hedged(self, providers: list, request: dict):
+        """
+        _stream_sequential avec requête différée sur le premier fragment : si le
+        principal n'a rien émis après config.LLM_HEDGE_DELAY_SECONDS, le secondaire
+        est lancé en parallèle ; le premier qui émet est gardé, l'autre est arrêté.
+        """
+        executor = _get_hedge_executor()
+        events = queue.SimpleQueue()
+        stops, last_error = [], None
+        
+        def start(rang):
+            stops.append(threading.Event())
+            executor.submit(self._pump_stream, rang, providers[rang], request, events, stops[rang])
+        
+        start(0)
+        en_cours, gagnant, chunks = {0}, None, []
+        try:
+            while True:
+                try:
+                    attente = config.LLM_HEDGE_DELAY_SECONDS if gagnant is None and len(stops) == 1 else None
+                    rang, kind, value = events.get(timeout=attente)
+                except queue.Empty:
+                    start(1)
+                    en_cours.add(1)
+                    continue
+                if gagnant is None and kind != "error":
+                    gagnant = rang
+                    for autre, stop in enumerate(stops):
+                        if autre != rang:
+                            stop.set()
+                if rang != gagnant:
+                    if kind == "error":
+                        last_error = self._error_message(providers[rang], value)
+                        en_cours.discard(rang)
+                        if len(stops) == 1:
+                            # Échec rapide du principal : bascule immédiate sur le secondaire
+                            start(1)
+                            en_cours.add(1)
+                        elif not en_cours:
+                            break
+                    continue
+                if kind == "chunk":
+                    chunks.append(value)
+                    yield value
+                elif kind == "end":
+                    return providers[rang], "".join(chunks)
+                else:
+                    # Réponse partielle déjà affichée : impossible de basculer proprement
+                    raise RuntimeError(self._error_message(providers[rang], value)) from value
+        finally:
+            for stop in stops:
+                stop.set()
+        
+        return (yield from self._stream_sequential(providers[2:], request, last_error))
+    
+    def _pump_stream(self, rang: int, provider: dict, request: dict, events, stop: threading.Event):
+        """Lit le flux d'un fournisseur dans un thread et transmet (rang, type, valeur) à `events`"""
+        if stop.is_set():
+            return
+        stream = self._stream_attempt(provider, request)
+        try:
+            for chunk in stream:
+                if stop.is_set():
+                    return
+                events.put((rang, "chunk", chunk))
+        except Exception as e:
+            events.put((rang, "error", e))
+            return
+        finally:
+            stream.close()
+        events.put((rang, "end", None))
+    
+    async def aanalyze(self, prompt: str, max_tokens: int = None, use_cache: bool = True,
+                       hedged: bool = None, prefer: str = None, json_mode: bool = False,
+                       schema: dict = None, task: str = None, prefix: str = None,
+                       max_queue_wait: float = None) -> dict:
+        """
+        Équivalent asynchrone de analyze() (même contrat de retour).
+        max_queue_wait : attente maximale dans la file d'un limiteur avant de passer au suivant.
+        """
+        start = time.monotonic()
+        request = self._build_request(prompt, max_tokens, json_mode, schema, task, prefix, max_queue_wait)
+        if self.cache and use_cache:
+            cached = self._cache_get(request)
+            if cached:
+                provider_name, result = cached
+                response = self._success(provider_name, result)
+                self._record_call(request, response, start, cache_hit=True)
+                return response
+        
+        flight, leader = self._join_flight(request)
+        if not leader:
+            response = dict(await asyncio.wrap_future(flight))
+            self._record_call(request, response, start, coalesced=True)
+            return response
+        
+        response = self._failure(INTERRUPTED_ERROR)
+        try:
+            self._observe_prefix(request)
+            providers = self._ordered_providers(prefer, request)
+            if hedged is None:
+                hedged = config.LLM_HEDGE_ENABLED
+            if hedged and len(providers) > 1:
+                response = await self._aanalyze_hedged(providers, request)
+            else:
+                response = await self._aanalyze_sequential(providers, request)
+        finally:
+            self._land_flight(request, flight, response)
+        self._record_call(request, response, start)
+        return response
+    
+    async def _aanalyze_sequential(self, providers: list, request: dict,
+                                   last_error=None) -> dict:
+        for provider in providers:
+            try:
+                result = await self._acall_provider(provider, request)
             except Exception as e:
-                last_error = f"Erreur avec {provider['name']}: {str(e)[:100]}"
+                last_error = self._error_message(provider, e)
                 continue
+            if self.cache:
+                self._cache_set(provider, request, result)
+            return self._success(provider["name"], result)
         
+        return self._failure(last_error)
+    
+    async def _aanalyze_hedged(self, providers: list, request: dict) -> dict:
+        """Version asynchrone de _analyze_hedged ; la tâche perdante est annulée"""
+        primary, secondary = providers[0], providers[1]
+        last_error = None
+        
+        tasks = {asyncio.ensure_future(self._acall_provider(primary, request)): primary}
+        done, pending = await asyncio.wait(tasks, timeout=config.LLM_HEDGE_DELAY_SECONDS)
+        if not done:
+            task = asyncio.ensure_future(self._acall_provider(secondary, request))
+            tasks[task] = secondary
+            pending.add(task)
+        
+        try:
+            while True:
+                for task in done:
+                    provider = tasks[task]
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        last_error = self._error_message(provider, e)
+                        if len(tasks) == 1:
+                            retry = asyncio.ensure_future(self._acall_provider(secondary, request))
+                            tasks[retry] = secondary
+                            pending.add(retry)
+                        continue
+                    if self.cache:
+                        self._cache_set(provider, request, result)
+                    return self._success(provider["name"], result)
+                
+                if not pending:
+                    break
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in pending:
+                task.cancel()
+        
+        return await self._aanalyze_sequential(providers[2:], request, last_error)
+    
+    async def aanalyze_many(self, prompts: list, max_tokens: int = None, concurrency: int = None,
+                            on_progress=None, **kwargs) -> list:
+        """
+        Analyse plusieurs prompts en parallèle sur la même boucle d'événements,
+        au plus `concurrency` à la fois (défaut : config.LLM_ASYNC_CONCURRENCY) ;
+        les quotas des fournisseurs s'appliquent à chaque appel.
+        
+        Chaque élément est un prompt (str) ou un dict de paramètres de aanalyze()
+        ("prompt", "prefix", "task", "schema"...), complétés par `kwargs`.
+        Retourne les résultats dans l'ordre des prompts ; une erreur reste propre
+        à son élément. Un élément en mode JSON ("json_mode" ou "schema") suit le
+        contrat de analyze_json (données décodées dans "result").
+        on_progress(terminés, total) est appelé après chaque élément.
+        Un lot attend son tour dans les files des limiteurs jusqu'à
+        config.LLM_BATCH_MAX_QUEUE_WAIT_SECONDS au lieu d'échouer.
+        """
+        kwargs.setdefault("max_queue_wait", config.LLM_BATCH_MAX_QUEUE_WAIT_SECONDS)
+        semaphore = asyncio.Semaphore(concurrency or config.LLM_ASYNC_CONCURRENCY)
+        done = 0
+        
+        async def _one(item):
+            nonlocal done
+            params = dict(kwargs, max_tokens=max_tokens)
+            params.update(item if isinstance(item, dict) else {"prompt": item})
+            async with semaphore:
+                try:
+                    response = await self.aanalyze(**params)
+                    if params.get("json_mode") or params.get("schema"):
+                        response = self._decode_json(response, params.get("schema"))
+                except Exception as e:
+                    response = self._failure(f"Erreur inattendue : {str(e)[:100]}")
+            done += 1
+            if on_progress:
+                on_progress(done, len(prompts))
+            return response
+        
+        return await asyncio.gather(*[_one(item) for item in prompts])
+    
+    def analyze_many(self, prompts: list, max_tokens: int = None, concurrency: int = None,
+                     on_progress=None, **kwargs) -> dict:
+        """
+        Analyse un lot de prompts préparés en une passe (voir aanalyze_many).
+        
+        Retourne {"results": [...], "stats": {...}} : les réponses dans l'ordre
+        (même contrat que analyze) et le débit global du lot.
+        on_progress est appelé dans le thread appelant (celui du script Streamlit),
+        pas dans celui de la boucle LLM.
+        """
+        concurrency = concurrency or config.LLM_ASYNC_CONCURRENCY
+        start = time.monotonic()
+        progression = queue.SimpleQueue()
+        future = submit_async(self.aanalyze_many(
+            prompts, max_tokens=max_tokens, concurrency=concurrency,
+            on_progress=lambda done, total: progression.put((done, total)), **kwargs
+        ))
+        while True:
+            try:
+                done, total = progression.get(timeout=0.1)
+            except queue.Empty:
+                if future.done():
+                    break
+                continue
+            if on_progress:
+                on_progress(done, total)
+        results = future.result()
+        seconds = time.monotonic() - start
+        succeeded = sum(1 for response in results if response["success"])
         return {
-            "success": False,
-            "result": None,
-            "provider": None,
-            "error": last_error or "Tous les services d'IA sont indisponibles. Veuillez réessayer plus tard."
+            "results": results,
+            "stats": {
+                "items": len(results),
+                "succeeded": succeeded,
+                "failed": len(results) - succeeded,
+                "concurrency": concurrency,
+                "seconds": round(seconds, 3),
+                "items_per_minute": round(len(results) * 60 / seconds, 2) if seconds else None
+            }
         }
+
+
+@st.cache_resource
+def get_llm_manager() -> LLMManager:
+    """Gestionnaire LLM unique partagé par toutes les sessions Streamlit du processus"""
+    return LLMManager()
@@ -0,0 +1,150 @@
+"""
+Analyse par parties (« map-reduce ») des longs appels d'offres
+
+Le document est découpé en blocs de pages qui tiennent chacun dans un appel ;
+chaque bloc reçoit une extraction compacte (notes JSON), tous les blocs en
+parallèle, puis les notes fusionnées remplacent le document dans le prompt
+habituel (analyse de préqualification, exigences) pour un seul appel final.
+"""
+import re
+import config
+from llm_budget import count_tokens, truncate_to_tokens
+from llm_manager import get_llm_manager
+from pertinence import decouper
+
+CONSIGNE_BLOC = """Voici une partie ({etiquette}) d'un long appel d'offres.
+Extrais UNIQUEMENT les informations présentes dans cette partie, de façon très concise.
+
+Sujets recherchés : {sujets}
+
+- Une information = un élément de liste court, avec la page entre parenthèses, ex. « (p. 12) »,
+  d'après les repères « --- Page N --- »
+- Laisse vides les clés sans information dans cette partie ; n'invente rien
+
+Réponds UNIQUEMENT avec un objet JSON (sans markdown) ayant les clés : {cles}
+
+PARTIE DU DOCUMENT :
+{bloc}
+"""
+
+ENTETE_NOTES = "[Notes extraites de chaque partie du document (analyse par parties) ; les pages sont celles du document]"
+
+
+def _unites(pages: list, max_tokens: int, provider_type: str = None) -> list:
+    """(numéro de page ou None, texte) : une unité par page, ou par passage si la page dépasse un bloc"""
+    unites = []
+    for numero, texte in enumerate(pages, 1):
+        if not texte.strip():
+            continue
+        numero = numero if len(pages) > 1 else None
+        repere = f"--- Page {numero} ---\n" if numero else ""
+        if count_tokens(repere + texte, provider_type) <= max_tokens:
+            unites.append((numero, repere + texte))
+            continue
+        for passage in decouper(texte):
+            unites.append((numero, truncate_to_tokens(repere + passage, max_tokens, provider_type)))
+    return unites
+
+
+def decouper_blocs(pages: list, max_tokens: int, provider_type: str = None) -> list:
+    """
+    Regroupe les pages consécutives en blocs d'au plus `max_tokens`.
+    Retourne une liste de {"etiquette", "texte"} dans l'ordre du document.
+    """
+    blocs, courant, taille = [], [], 0
+    for numero, texte in _unites(pages, max_tokens, provider_type):
+        cout = count_tokens(texte, provider_type) + 1
+        if courant and taille + cout > max_tokens:
+            blocs.append(courant)
+            courant, taille = [], 0
+        courant.append((numero, texte))
+        taille += cout
+    if courant:
+        blocs.append(courant)
+
+    resultats = []
+    for rang, bloc in enumerate(blocs, 1):
+        debut, fin = bloc[0][0], bloc[-1][0]
+        if debut is None:
+            etiquette = f"partie {rang} sur {len(blocs)}"
+        elif debut == fin:
+            etiquette = f"page {debut}"
+        else:
+            etiquette = f"pages {debut} à {fin}"
+        resultats.append({"etiquette": etiquette, "texte": "\n".join(texte for _, texte in bloc)})
+    return resultats
+
+
+def _normaliser(element: str) -> str:
+    return " ".join(re.findall(r"\w+", element.lower()))
+
+
+def fusionner_notes(blocs: list, reponses: list) -> str:
+    """
+    Notes de tous les blocs, dans l'ordre du document, en texte compact :
+    les éléments déjà vus dans un bloc précédent sont omis.
+    """
+    lignes, vus = [ENTETE_NOTES], set()
+    for bloc, reponse in zip(blocs, reponses):
+        if not reponse["success"]:
+            lignes.append(f"\n## {bloc['etiquette'].capitalize()}\n- [Extraction impossible pour cette partie]")
+            continue
+        notes = reponse["result"] if isinstance(reponse["result"], dict) else {}
+        contenu = []
+        for cle, valeur in notes.items():
+            elements = valeur if isinstance(valeur, list) else [valeur]
+            nouveaux = []
+            for element in elements:
+                if not isinstance(element, str) or not element.strip():
+                    continue
+                cle_element = (cle, _normaliser(element))
+                if cle_element in vus:
+                    continue
+                vus.add(cle_element)
+                nouveaux.append(element.strip())
+            if nouveaux:
+                contenu.append(f"- {cle.replace('_', ' ').capitalize()} : {' ; '.join(nouveaux)}")
+        if contenu:
+            lignes.append(f"\n## {bloc['etiquette'].capitalize()}")
+            lignes.extend(contenu)
+    return "\n".join(lignes)
+
+
+def analyser_par_blocs(pages: list, schema: dict, sujets: list, concurrency: int = None,
+                       on_progress=None) -> tuple:
+    """
+    Étape « map » : extrait les notes de chaque bloc du document (liste des
+    textes de pages) selon `schema`, au plus `concurrency` blocs à la fois
+    (défaut : config.LLM_MAP_REDUCE_CONCURRENCY).
+    Retourne (notes fusionnées à placer dans le prompt final, rapport).
+    """
+    manager = get_llm_manager()
+    consigne = CONSIGNE_BLOC.format(
+        etiquette="", sujets=", ".join(sujets), cles=", ".join(schema["properties"]), bloc=""
+    )
+    budget, provider_type = manager.input_budget(task="extraction_bloc")
+    taille_bloc = min(config.LLM_MAP_REDUCE_BLOCK_TOKENS, budget - count_tokens(consigne, provider_type) - 20)
+    blocs = decouper_blocs(pages, max(500, taille_bloc), provider_type)
+
+    lot = manager.analyze_many(
+        [
+            {
+                "prompt": CONSIGNE_BLOC.format(
+                    etiquette=bloc["etiquette"], sujets=", ".join(sujets),
+                    cles=", ".join(schema["properties"]), bloc=bloc["texte"]
+                ),
+                "schema": schema,
+                "task": "extraction_bloc"
+            }
+            for bloc in blocs
+        ],
+        concurrency=concurrency or config.LLM_MAP_REDUCE_CONCURRENCY,
+        on_progress=on_progress
+    )
+    reponses = lot["results"]
+    return fusionner_notes(blocs, reponses), {
+        "blocs": len(blocs),
+        "reussis": lot["stats"]["succeeded"],
+        "echoues": lot["stats"]["failed"],
+        "secondes": lot["stats"]["seconds"]
+    }
@@ -0,0 +1,73 @@
+"""
+Vérification locale de la stabilité des préfixes de prompt (mise en cache côté fournisseur)
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+import config
+
+
+class PrefixCacheStub:
+    """
+    Imite le cache de préfixe d'un fournisseur : un préfixe déjà vu avant
+    l'expiration (TTL) compte comme un succès. Des appels répétés sans
+    aucun succès signalent un préfixe instable (date, texte variable...).
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int = 256):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._seen = OrderedDict()
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def observe(self, task: str, prefix: str) -> bool:
+        """Enregistre un appel ; True si un fournisseur aurait pu réutiliser ce préfixe"""
+        digest = hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+        now = time.monotonic()
+        with self._lock:
+            stats = self._stats.setdefault(task, {
+                "calls": 0, "hits": 0, "prefixes": set(), "reused_chars": 0
+            })
+            seen_at = self._seen.pop(digest, None)
+            hit = seen_at is not None and now - seen_at <= self.ttl_seconds
+            self._seen[digest] = now
+            while len(self._seen) > self.max_entries:
+                self._seen.popitem(last=False)
+
+            stats["calls"] += 1
+            stats["prefixes"].add(digest)
+            if hit:
+                stats["hits"] += 1
+                stats["reused_chars"] += len(prefix)
+        return hit
+
+    def stats(self) -> list:
+        """Par tâche : appels, succès, préfixes distincts et tokens réutilisables estimés"""
+        with self._lock:
+            items = [(task, dict(s, prefixes=len(s["prefixes"]))) for task, s in self._stats.items()]
+        return [
+            {
+                "task": task,
+                "calls": s["calls"],
+                "hits": s["hits"],
+                "hit_rate": round(s["hits"] / s["calls"], 3) if s["calls"] else 0.0,
+                "distinct_prefixes": s["prefixes"],
+                "reused_tokens_estimate": s["reused_chars"] // 4,
+                "stable": s["calls"] < 2 or s["prefixes"] < s["calls"]
+            }
+            for task, s in items
+        ]
+
+
+_stub = None
+_stub_lock = threading.Lock()
+
+
+def get_prefix_stub() -> PrefixCacheStub:
+    global _stub
+    with _stub_lock:
+        if _stub is None:
+            _stub = PrefixCacheStub(config.LLM_PREFIX_CACHE_TTL_SECONDS)
+        return _stub
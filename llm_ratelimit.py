@@ -0,0 +1,202 @@
+"""
+Limitation de débit des fournisseurs LLM (requêtes/min et tokens/min)
+"""
+import threading
+import time
+import config
+
+
+class RateLimitExceeded(Exception):
+    """File d'attente pleine ou attente supérieure au maximum autorisé"""
+
+
+def estimate_tokens(prompt: str, max_tokens: int, expected_output: int = None) -> int:
+    """
+    Estimation grossière du coût en tokens d'un appel : entrée ≈ 4 caractères/token
+    + sortie attendue (`max_tokens` si elle est inconnue, bornée par `max_tokens`)
+    """
+    output = max_tokens if expected_output is None else min(max_tokens, expected_output)
+    return len(prompt) // 4 + output
+
+
+def retry_after_seconds(error: Exception):
+    """
+    Retourne le délai demandé par le fournisseur si l'erreur est un 429, sinon None.
+    Utilise l'en-tête Retry-After quand il est présent.
+    """
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None) or getattr(error, "code", None)
+    if status != 429:
+        return None
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return config.LLM_RETRY_AFTER_DEFAULT_SECONDS
+
+
+class TokenBucket:
+    """Seau à jetons : capacité `per_minute`, rechargé en continu"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def time_until(self, amount: float) -> float:
+        """Secondes avant que `amount` jetons soient disponibles (bornés par la capacité)"""
+        missing = min(amount, self.capacity) - self.tokens
+        return max(0.0, missing / self.rate) if self.rate else float("inf")
+
+    def consume(self, amount: float):
+        self.tokens -= min(amount, self.capacity)
+
+
+class ProviderRateLimiter:
+    """
+    Limiteur partagé d'un fournisseur : un seau pour les requêtes/min, un pour
+    les tokens/min, une file d'attente bornée et un blocage temporaire après 429.
+    """
+    OUTPUT_MARGIN = 1.5
+    OUTPUT_SMOOTHING = 0.2
+
+    def __init__(self, name: str, rpm: int, tpm: int, max_queue: int, max_wait: float):
+        self.name = name
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.blocked_until = 0.0
+        self._output_tokens = None
+        self._cond = threading.Condition()
+        self._waiting = 0
+        self._stats = {
+            "acquired": 0,
+            "waited": 0,
+            "total_wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+            "max_queue_depth": 0,
+            "rejected": 0,
+            "throttled_429": 0
+        }
+
+    def estimate(self, prompt: str, max_tokens: int) -> int:
+        """
+        Coût estimé d'un appel : la sortie est comptée d'après celles déjà observées
+        pour ce fournisseur (moyenne mobile majorée de OUTPUT_MARGIN) plutôt qu'au
+        maximum demandé, qui surestime largement la plupart des réponses
+        """
+        with self._cond:
+            observed = self._output_tokens
+        expected = None if observed is None else int(observed * self.OUTPUT_MARGIN) + 1
+        return estimate_tokens(prompt, max_tokens, expected)
+
+    def record_output(self, tokens: int):
+        """Tokens de sortie réellement facturés par un appel réussi"""
+        if tokens is None:
+            return
+        with self._cond:
+            if self._output_tokens is None:
+                self._output_tokens = float(tokens)
+            else:
+                self._output_tokens += self.OUTPUT_SMOOTHING * (tokens - self._output_tokens)
+
+    def acquire(self, tokens: int, max_wait: float = None) -> float:
+        """
+        Attend que le budget permette l'appel ; retourne le temps d'attente en secondes.
+        `max_wait` remplace l'attente maximale du limiteur (traitements en lot).
+        """
+        max_wait = self.max_wait if max_wait is None else max_wait
+        start = time.monotonic()
+        with self._cond:
+            if self._waiting >= self.max_queue:
+                self._stats["rejected"] += 1
+                raise RateLimitExceeded(f"File d'attente pleine pour {self.name}")
+            self._waiting += 1
+            self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], self._waiting)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self.requests.refill(now)
+                    self.tokens.refill(now)
+                    delay = max(
+                        self.blocked_until - now,
+                        self.requests.time_until(1),
+                        self.tokens.time_until(tokens)
+                    )
+                    if delay <= 0:
+                        self.requests.consume(1)
+                        self.tokens.consume(tokens)
+                        break
+                    if now + delay - start > max_wait:
+                        self._stats["rejected"] += 1
+                        raise RateLimitExceeded(
+                            f"Quota de {self.name} atteint (attente estimée {delay:.0f} s)"
+                        )
+                    self._cond.wait(delay)
+            finally:
+                self._waiting -= 1
+
+            waited = time.monotonic() - start
+            self._stats["acquired"] += 1
+            if waited > 0.001:
+                self._stats["waited"] += 1
+                self._stats["total_wait_seconds"] += waited
+                self._stats["max_wait_seconds"] = max(self._stats["max_wait_seconds"], waited)
+        return waited
+
+    def penalize(self, retry_after: float):
+        """Bloque le fournisseur pendant `retry_after` secondes (réponse 429)"""
+        with self._cond:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+            self._stats["throttled_429"] += 1
+            self._cond.notify_all()
+
+    def metrics(self) -> dict:
+        with self._cond:
+            stats = dict(self._stats)
+            blocked_for = max(0.0, self.blocked_until - time.monotonic())
+            queue_depth = self._waiting
+        waited = stats["waited"]
+        return dict(
+            stats,
+            provider=self.name,
+            queue_depth=queue_depth,
+            avg_wait_seconds=round(stats["total_wait_seconds"] / waited, 3) if waited else 0.0,
+            total_wait_seconds=round(stats["total_wait_seconds"], 3),
+            max_wait_seconds=round(stats["max_wait_seconds"], 3),
+            blocked_for_seconds=round(blocked_for, 1)
+        )
+
+
+# Limiteurs partagés par toutes les sessions du processus
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(provider: dict) -> ProviderRateLimiter:
+    """Limiteur du fournisseur (quotas lus dans config.LLM_RATE_LIMITS selon son type)"""
+    with _limiters_lock:
+        limiter = _limiters.get(provider["name"])
+        if limiter is None:
+            limits = config.LLM_RATE_LIMITS.get(provider["type"], {})
+            limiter = _limiters[provider["name"]] = ProviderRateLimiter(
+                provider["name"],
+                rpm=limits.get("rpm", 60),
+                tpm=limits.get("tpm", 100_000),
+                max_queue=config.LLM_RATE_LIMIT_MAX_QUEUE,
+                max_wait=config.LLM_RATE_LIMIT_MAX_WAIT_SECONDS
+            )
+        return limiter
+
+
+def rate_limit_snapshot() -> list:
+    """Métriques de tous les limiteurs (profondeur de file, temps d'attente, rejets, 429)"""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return [limiter.metrics() for limiter in limiters]
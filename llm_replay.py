@@ -0,0 +1,120 @@
+"""
+Fournisseur LLM d'enregistrement/rejeu pour les benchmarks hors ligne
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import config
+
+
+class ReplayFixtureMissing(LookupError):
+    """Aucune réponse enregistrée pour ce prompt"""
+
+
+class ReplayInjectedError(Exception):
+    """Panne simulée (taux d'échec configuré)"""
+
+
+def fixture_key(request: dict) -> str:
+    """
+    Empreinte SHA-256 d'une requête (prompt et paramètres de génération).
+    Le fournisseur n'en fait pas partie : une réponse enregistrée avec
+    n'importe quel fournisseur est rejouée pour le même prompt.
+    """
+    payload = json.dumps(
+        {
+            "prompt": request["prompt"],
+            "max_tokens": request["max_tokens"],
+            "json": request["schema"] or request["json"]
+        },
+        sort_keys=True,
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class FixtureStore:
+    """Répertoire de réponses enregistrées : un fichier JSON par empreinte de prompt"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def load(self, key: str):
+        try:
+            with open(self.path(key), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save(self, request: dict, provider: dict, result: str, measures: dict = None):
+        """Enregistre une réponse (écriture atomique, la dernière réponse remplace la précédente)"""
+        measures = measures or {}
+        key = fixture_key(request)
+        fixture = {
+            "key": key,
+            "task": request.get("task"),
+            "provider": provider["name"],
+            "model": provider["model"],
+            "prompt_debut": request["prompt"][:200],
+            "result": result,
+            "input_tokens": measures.get("input_tokens"),
+            "output_tokens": measures.get("output_tokens"),
+            "latency_seconds": measures.get("latency"),
+            "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S")
+        }
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = f"{self.path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(fixture, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.path(key))
+
+
+class ReplayClient:
+    """
+    Sert les réponses enregistrées avec une latence injectée
+    (fixe + gigue aléatoire) et un taux d'échec configurable.
+    Une graine (LLM_REPLAY_SEED) rend la séquence de latences/pannes reproductible.
+    """
+
+    def __init__(self, store: FixtureStore, latency: float = None, jitter: float = None,
+                 failure_rate: float = None, seed=None):
+        self.store = store
+        self.latency = config.LLM_REPLAY_LATENCY_SECONDS if latency is None else latency
+        self.jitter = config.LLM_REPLAY_JITTER_SECONDS if jitter is None else jitter
+        self.failure_rate = config.LLM_REPLAY_FAILURE_RATE if failure_rate is None else failure_rate
+        self._random = random.Random(config.LLM_REPLAY_SEED if seed is None else seed)
+        self._lock = threading.Lock()
+
+    def _plan(self, request: dict):
+        """Retourne (réponse enregistrée, délai, échec simulé ?)"""
+        key = fixture_key(request)
+        fixture = self.store.load(key)
+        if fixture is None:
+            raise ReplayFixtureMissing(
+                f"aucune réponse enregistrée (empreinte {key[:12]}), lancez d'abord LLM_REPLAY_MODE=record"
+            )
+        with self._lock:
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+            failed = self._random.random() < self.failure_rate
+        return fixture, delay, failed
+
+    def complete(self, request: dict) -> dict:
+        fixture, delay, failed = self._plan(request)
+        time.sleep(delay)
+        if failed:
+            raise ReplayInjectedError("panne simulée")
+        return fixture
+
+    async def acomplete(self, request: dict) -> dict:
+        fixture, delay, failed = self._plan(request)
+        await asyncio.sleep(delay)
+        if failed:
+            raise ReplayInjectedError("panne simulée")
+        return fixture
@@ -0,0 +1,72 @@
+"""
+Regroupement des appels LLM identiques en cours (« single-flight »)
+"""
+import hashlib
+import json
+import threading
+from concurrent.futures import Future
+
+
+def flight_key(request: dict) -> str:
+    """Clé d'un appel : prompt complet et paramètres qui influencent la réponse"""
+    contenu = json.dumps({
+        "prompt": request["prompt"],
+        "max_tokens": request["max_tokens"],
+        "json": request["schema"] or request["json"],
+        "task": request["task"]
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(contenu.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """
+    Un seul appel par clé à la fois dans le processus : les appelants
+    suivants attendent la réponse du premier (le « meneur ») au lieu de
+    renvoyer la même requête. Le résultat est un concurrent.futures.Future,
+    attendu par future.result() dans un thread ou asyncio.wrap_future()
+    dans n'importe quelle boucle d'événements.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._leaders = 0
+        self._coalesced = 0
+
+    def begin(self, key: str) -> tuple:
+        """Retourne (future, meneur) : seul le meneur effectue l'appel puis appelle finish()"""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self._coalesced += 1
+                return future, False
+            future = self._calls[key] = Future()
+            self._leaders += 1
+            return future, True
+
+    def finish(self, key: str, future: Future, response: dict):
+        """Publie la réponse du meneur ; les appels suivants repartent d'une nouvelle requête"""
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+        future.set_result(response)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "leaders": self._leaders,
+                "coalesced": self._coalesced
+            }
+
+
+_singleflight = None
+_singleflight_lock = threading.Lock()
+
+
+def get_singleflight() -> SingleFlight:
+    global _singleflight
+    with _singleflight_lock:
+        if _singleflight is None:
+            _singleflight = SingleFlight()
+        return _singleflight
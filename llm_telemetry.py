@@ -0,0 +1,229 @@
+"""
+Télémétrie des appels LLM : durées, tokens, coût et fournisseur par appel
+"""
+import json
+import threading
+import time
+from collections import deque
+import config
+
+# Bornes (secondes) de l'histogramme des durées d'appel
+LATENCY_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+
+TACHE_PAR_DEFAUT = "general"
+
+
+def estimate_cost(model: str, input_tokens: int, output_tokens: int, cached_input_tokens: int = 0) -> float:
+    """
+    Coût estimé en $ US selon config.LLM_PRICING (0 si le modèle n'y figure pas).
+    Les tokens d'entrée lus dans le cache du fournisseur sont facturés au tarif "cached_input".
+    """
+    prix = config.LLM_PRICING.get(model)
+    if not prix:
+        return 0.0
+    cached = min(cached_input_tokens, input_tokens)
+    return (
+        (input_tokens - cached) * prix["input"]
+        + cached * prix.get("cached_input", prix["input"])
+        + output_tokens * prix["output"]
+    ) / 1_000_000
+
+
+def new_attempt(provider: dict) -> dict:
+    """Mesures d'une tentative auprès d'un fournisseur, complétées pendant l'appel"""
+    return {
+        "provider": provider["name"],
+        "model": provider["model"],
+        "ok": False,
+        "queue_wait": 0.0,
+        "ttfb": None,
+        "latency": None,
+        "input_tokens": None,
+        "cached_input_tokens": 0,
+        "output_tokens": None
+    }
+
+
+def call_event(request: dict, response: dict, total_seconds: float, cache_hit: bool = False,
+               coalesced: bool = False) -> dict:
+    """
+    Résume un appel logique (toutes tentatives confondues) en un événement.
+    Les tokens non fournis par l'API sont estimés (≈ 4 caractères/token).
+    Un appel regroupé sur un appel identique en cours (`coalesced`) n'a
+    aucune tentative propre : ni tokens ni coût.
+    """
+    attempts = request.get("attempts", [])
+    winner = next(
+        (a for a in reversed(attempts) if a["ok"] and a["provider"] == response["provider"]), None
+    )
+    event = {
+        "ts": round(time.time(), 3),
+        "task": request.get("task") or TACHE_PAR_DEFAUT,
+        "status": (
+            "cache" if cache_hit else "coalesced" if coalesced
+            else "success" if response["success"] else "error"
+        ),
+        "provider": response["provider"],
+        "model": winner["model"] if winner else None,
+        "cache_hit": cache_hit,
+        "coalesced": coalesced,
+        "fallback_hops": len(attempts) - (1 if winner else 0),
+        "queue_wait_seconds": round(sum(a["queue_wait"] for a in attempts), 3),
+        "ttfb_seconds": round(winner["ttfb"], 3) if winner and winner["ttfb"] is not None else None,
+        "total_seconds": round(total_seconds, 3),
+        "input_tokens": 0,
+        "cached_input_tokens": 0,
+        "output_tokens": 0,
+        "tokens_estimated": False,
+        "prefix_cache_hit": request.get("prefix_hit"),
+        "cost_usd": 0.0,
+        "error": response["error"]
+    }
+    if winner:
+        input_tokens, output_tokens = winner["input_tokens"], winner["output_tokens"]
+        if input_tokens is None or output_tokens is None:
+            event["tokens_estimated"] = True
+            input_tokens = len(request["prompt"]) // 4 if input_tokens is None else input_tokens
+            output_tokens = len(response["result"] or "") // 4 if output_tokens is None else output_tokens
+        event["input_tokens"] = input_tokens
+        event["cached_input_tokens"] = winner["cached_input_tokens"]
+        event["output_tokens"] = output_tokens
+        event["cost_usd"] = round(
+            estimate_cost(winner["model"], input_tokens, output_tokens, winner["cached_input_tokens"]), 6
+        )
+    return event
+
+
+def _labels(**labels) -> str:
+    valeurs = ",".join(
+        '{}="{}"'.format(nom, str(valeur).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for nom, valeur in labels.items()
+    )
+    return "{" + valeurs + "}"
+
+
+class TelemetryRecorder:
+    """
+    Derniers appels dans un tampon circulaire (export JSON lines) et
+    compteurs cumulés depuis le démarrage du processus (export Prometheus).
+    """
+
+    def __init__(self, size: int):
+        self._events = deque(maxlen=size)
+        self._totals = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def record(self, event: dict):
+        cle = (event["task"], event["provider"] or "aucun", event["status"])
+        with self._lock:
+            self._events.append(event)
+            totals = self._totals.setdefault(cle, {
+                "calls": 0, "fallback_hops": 0, "input_tokens": 0, "cached_input_tokens": 0,
+                "output_tokens": 0, "cost_usd": 0.0, "queue_wait_seconds": 0.0, "ttfb_sum": 0.0, "ttfb_count": 0
+            })
+            totals["calls"] += 1
+            totals["fallback_hops"] += event["fallback_hops"]
+            totals["input_tokens"] += event["input_tokens"]
+            totals["cached_input_tokens"] += event["cached_input_tokens"]
+            totals["output_tokens"] += event["output_tokens"]
+            totals["cost_usd"] += event["cost_usd"]
+            totals["queue_wait_seconds"] += event["queue_wait_seconds"]
+            if event["ttfb_seconds"] is not None:
+                totals["ttfb_sum"] += event["ttfb_seconds"]
+                totals["ttfb_count"] += 1
+
+            histogram = self._histograms.setdefault(event["task"], {
+                "buckets": [0] * len(LATENCY_BUCKETS), "sum": 0.0, "count": 0
+            })
+            for i, borne in enumerate(LATENCY_BUCKETS):
+                if event["total_seconds"] <= borne:
+                    histogram["buckets"][i] += 1
+            histogram["sum"] += event["total_seconds"]
+            histogram["count"] += 1
+
+    def events(self) -> list:
+        with self._lock:
+            return list(self._events)
+
+    def to_jsonl(self) -> str:
+        """Un événement JSON par ligne (du plus ancien au plus récent)"""
+        return "".join(json.dumps(event, ensure_ascii=False) + "\n" for event in self.events())
+
+    def to_prometheus(self) -> str:
+        """Compteurs cumulés au format texte d'exposition Prometheus"""
+        with self._lock:
+            totals = {cle: dict(valeurs) for cle, valeurs in self._totals.items()}
+            histograms = {tache: dict(h, buckets=list(h["buckets"])) for tache, h in self._histograms.items()}
+
+        lignes = []
+
+        def metrique(nom, type_, aide, echantillons):
+            lignes.append(f"# HELP {nom} {aide}")
+            lignes.append(f"# TYPE {nom} {type_}")
+            lignes.extend(f"{nom}{labels} {valeur}" for labels, valeur in echantillons)
+
+        par_appel = [(_labels(task=t, provider=p, status=s), v) for (t, p, s), v in sorted(totals.items())]
+        metrique("llm_calls_total", "counter",
+                 "Appels LLM par tâche, fournisseur et statut (cache, coalesced, success, error)",
+                 [(labels, v["calls"]) for labels, v in par_appel])
+        metrique("llm_fallback_hops_total", "counter", "Fournisseurs écartés avant la réponse",
+                 [(labels, v["fallback_hops"]) for labels, v in par_appel])
+        metrique("llm_tokens_total", "counter",
+                 "Tokens consommés (entrée, dont lus dans le cache du fournisseur, sortie)",
+                 [(_labels(task=t, provider=p, status=s, direction=d), v[f"{d}_tokens"])
+                  for (t, p, s), v in sorted(totals.items()) for d in ("input", "cached_input", "output")])
+        metrique("llm_cost_usd_total", "counter", "Coût estimé en dollars US",
+                 [(labels, round(v["cost_usd"], 6)) for labels, v in par_appel])
+        metrique("llm_queue_wait_seconds_total", "counter", "Attente cumulée dans les files des limiteurs",
+                 [(labels, round(v["queue_wait_seconds"], 3)) for labels, v in par_appel])
+        metrique("llm_ttfb_seconds_sum", "counter", "Somme des délais avant le premier octet",
+                 [(labels, round(v["ttfb_sum"], 3)) for labels, v in par_appel])
+        metrique("llm_ttfb_seconds_count", "counter", "Appels dont le délai avant le premier octet est connu",
+                 [(labels, v["ttfb_count"]) for labels, v in par_appel])
+
+        lignes.append("# HELP llm_call_duration_seconds Durée totale des appels LLM par tâche")
+        lignes.append("# TYPE llm_call_duration_seconds histogram")
+        for tache, h in sorted(histograms.items()):
+            for borne, compte in zip(LATENCY_BUCKETS, h["buckets"]):
+                lignes.append(f"llm_call_duration_seconds_bucket{_labels(task=tache, le=borne)} {compte}")
+            lignes.append(f"llm_call_duration_seconds_bucket{_labels(task=tache, le='+Inf')} {h['count']}")
+            lignes.append(f"llm_call_duration_seconds_sum{_labels(task=tache)} {round(h['sum'], 3)}")
+            lignes.append(f"llm_call_duration_seconds_count{_labels(task=tache)} {h['count']}")
+        return "\n".join(lignes) + "\n"
+
+    def summary(self) -> list:
+        """Agrégats par tâche sur le tampon courant (appels, durée moyenne, tokens, coût)"""
+        par_tache = {}
+        for event in self.events():
+            agregat = par_tache.setdefault(event["task"], {
+                "task": event["task"], "calls": 0, "cache_hits": 0, "coalesced": 0, "errors": 0,
+                "total_seconds": 0.0, "input_tokens": 0, "cached_input_tokens": 0, "output_tokens": 0,
+                "cost_usd": 0.0
+            })
+            agregat["calls"] += 1
+            agregat["cache_hits"] += event["cache_hit"]
+            agregat["coalesced"] += event.get("coalesced", False)
+            agregat["errors"] += event["status"] == "error"
+            agregat["total_seconds"] += event["total_seconds"]
+            agregat["input_tokens"] += event["input_tokens"]
+            agregat["cached_input_tokens"] += event["cached_input_tokens"]
+            agregat["output_tokens"] += event["output_tokens"]
+            agregat["cost_usd"] += event["cost_usd"]
+        for agregat in par_tache.values():
+            agregat["avg_seconds"] = round(agregat.pop("total_seconds") / agregat["calls"], 3)
+            agregat["cost_usd"] = round(agregat["cost_usd"], 6)
+        return sorted(par_tache.values(), key=lambda a: a["cost_usd"], reverse=True)
+
+
+# Enregistreur partagé par toutes les sessions du processus
+_recorder = None
+_recorder_lock = threading.Lock()
+
+
+def get_recorder() -> TelemetryRecorder:
+    global _recorder
+    with _recorder_lock:
+        if _recorder is None:
+            _recorder = TelemetryRecorder(config.LLM_TELEMETRY_BUFFER_SIZE)
+        return _recorder
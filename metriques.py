@@ -0,0 +1,74 @@
+"""
+Onglet « Exploitation » : métriques du processus Streamlit (réservé à ADMIN_EMAILS)
+
+Les compteurs vivent en mémoire dans le serveur et couvrent toutes les sessions :
+coût et durée des appels LLM par tâche, caches, appels regroupés, santé et
+quotas des fournisseurs. La télémétrie se télécharge en JSON lines (derniers
+appels) ou au format Prometheus (compteurs cumulés).
+"""
+from datetime import datetime
+import streamlit as st
+import config
+from extraction_pdf import get_text_cache
+from llm_manager import get_llm_manager
+
+
+def est_admin(user: dict) -> bool:
+    return (user.get('contact_email') or '').strip().lower() in config.ADMIN_EMAILS
+
+
+def _tableau(titre: str, lignes: list, vide: str):
+    st.markdown(f"**{titre}**")
+    if lignes:
+        st.dataframe(lignes, use_container_width=True, hide_index=True)
+    else:
+        st.caption(vide)
+
+
+def show_metriques_tab():
+    """Affiche les métriques du processus et les exports de télémétrie"""
+    st.header("📈 Exploitation")
+    st.caption("Compteurs du serveur depuis son démarrage, toutes sessions confondues")
+    if st.button("🔄 Actualiser"):
+        st.rerun()
+
+    manager = get_llm_manager()
+
+    _tableau(
+        "Appels LLM par tâche (du plus coûteux au moins coûteux)",
+        manager.telemetry_summary(),
+        "Aucun appel enregistré"
+    )
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.markdown("**Cache des réponses LLM**")
+        st.json(manager.cache_stats() or {"actif": False})
+    with col2:
+        st.markdown("**Cache des textes PDF**")
+        cache = get_text_cache()
+        st.json(cache.stats() if cache else {"actif": False})
+    with col3:
+        st.markdown("**Appels identiques regroupés**")
+        st.json(manager.singleflight_stats())
+
+    _tableau("Santé des fournisseurs", manager.provider_health(), "Aucun fournisseur sollicité")
+    _tableau("Quotas et files d'attente", manager.rate_limit_metrics(), "Aucun fournisseur sollicité")
+    _tableau("Stabilité des préfixes de prompt", manager.prefix_cache_stats(), "Aucun préfixe observé")
+
+    horodatage = datetime.now().strftime("%Y%m%d_%H%M%S")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button(
+            "📥 Télémétrie (JSON lines)",
+            data=manager.export_telemetry("jsonl"),
+            file_name=f"telemetrie_llm_{horodatage}.jsonl",
+            mime="application/x-ndjson"
+        )
+    with col2:
+        st.download_button(
+            "📥 Compteurs (Prometheus)",
+            data=manager.export_telemetry("prometheus"),
+            file_name=f"telemetrie_llm_{horodatage}.prom",
+            mime="text/plain"
+        )
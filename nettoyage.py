@@ -0,0 +1,114 @@
+"""
+Normalisation du texte extrait des PDF avant la construction des prompts
+
+pypdf restitue sur chaque page les en-têtes, pieds de page et numéros de
+page du document, ainsi que les pointillés et espaces des tables des
+matières. Ces lignes sont retirées ou compactées avant l'envoi au modèle :
+- lignes répétées en bordure de page (en-têtes, pieds de page), chiffres
+  ignorés pour reconnaître « Page 3 de 120 » et « Page 4 de 120 » ; la
+  première occurrence est gardée, car l'en-tête porte souvent le numéro,
+  le titre ou la date de clôture de l'appel d'offres
+- numéros de page isolés
+- pointillés de conduite (« ....... 12 »), traits et espaces multiples
+"""
+import re
+from collections import Counter
+import config
+from extraction_pdf import joindre_pages
+from llm_budget import count_tokens
+
+_ESPACES = re.compile(r"[ \t\u00a0\u2000-\u200b\u202f]+")
+_POINTILLES = re.compile(r"(?:[.·…_=\-][ \t]?){4,}")
+_NUMERO_PAGE = re.compile(r"^(?:page|p\.)?\s*\d+\s*(?:(?:/|de|sur|of)\s*\d+)?$", re.IGNORECASE)
+_CHIFFRES = re.compile(r"\d+")
+
+
+def _cle(ligne: str) -> str:
+    """Forme d'une ligne pour repérer les répétitions (minuscules, chiffres masqués)"""
+    return _CHIFFRES.sub("#", ligne.lower())
+
+
+def _bordure(lignes: list) -> dict:
+    """
+    Lignes en haut et en bas de page, où se trouvent en-têtes et pieds de page :
+    {indice: position}, la position étant comptée depuis le haut (0, 1...) ou le bas (-1, -2...)
+    """
+    n = min(config.TEXTE_LIGNES_BORDURE, len(lignes))
+    positions = {len(lignes) - 1 - i: -1 - i for i in range(n)}
+    positions.update({i: i for i in range(n)})
+    return positions
+
+
+def _lignes_repetees(pages_lignes: list) -> set:
+    """
+    (position, ligne) répétées à la même place sur au moins TEXTE_REPETITION_MIN_SHARE
+    des pages (et TEXTE_REPETITION_MIN_PAGES pages)
+    """
+    seuil = max(config.TEXTE_REPETITION_MIN_PAGES, config.TEXTE_REPETITION_MIN_SHARE * len(pages_lignes))
+    if len(pages_lignes) < seuil:
+        return set()
+    occurrences = Counter(
+        (position, _cle(lignes[i])) for lignes in pages_lignes for i, position in _bordure(lignes).items()
+    )
+    return {repere for repere, nombre in occurrences.items() if nombre >= seuil}
+
+
+def normaliser_pages(pages: list, provider_type: str = None) -> tuple:
+    """
+    Texte des pages sans en-têtes, pieds de page (gardés à leur première
+    occurrence) ni numéros de page, espaces et pointillés compactés (pages
+    inchangées si TEXTE_NORMALISATION_ENABLED est désactivé).
+    Retourne (pages normalisées, rapport des gains).
+    """
+    if not config.TEXTE_NORMALISATION_ENABLED:
+        return _rapport(pages, list(pages), 0, provider_type)
+    pages_lignes = [
+        [ligne for ligne in (_ESPACES.sub(" ", brute).strip() for brute in page.splitlines()) if ligne]
+        for page in pages
+    ]
+    repetees = _lignes_repetees(pages_lignes)
+
+    normalisees, retirees, vues = [], 0, set()
+    for lignes in pages_lignes:
+        bordure = _bordure(lignes)
+        gardees = []
+        for i, ligne in enumerate(lignes):
+            if i in bordure:
+                repere = (bordure[i], _cle(ligne))
+                if _NUMERO_PAGE.match(ligne) or repere in vues:
+                    retirees += 1
+                    continue
+                if repere in repetees:
+                    vues.add(repere)
+            ligne = _ESPACES.sub(" ", _POINTILLES.sub(" … ", ligne)).strip()
+            if ligne:
+                gardees.append(ligne)
+        normalisees.append("\n".join(gardees))
+    return _rapport(pages, normalisees, retirees, provider_type)
+
+
+def _rapport(pages: list, normalisees: list, retirees: int, provider_type: str = None) -> tuple:
+    avant, apres = joindre_pages(pages), joindre_pages(normalisees)
+    tokens_avant, tokens_apres = count_tokens(avant, provider_type), count_tokens(apres, provider_type)
+    return normalisees, {
+        "caracteres_avant": len(avant),
+        "caracteres_apres": len(apres),
+        "tokens_avant": tokens_avant,
+        "tokens_apres": tokens_apres,
+        "tokens_economises": tokens_avant - tokens_apres,
+        "lignes_retirees": retirees,
+        "gain": round(1 - len(apres) / len(avant), 3) if avant else 0.0
+    }
+
+
+def _milliers(nombre: int) -> str:
+    return f"{nombre:,}".replace(",", " ")
+
+
+def resume_normalisation(rapport: dict) -> str:
+    """Phrase affichée avec l'analyse : gains de la normalisation"""
+    return (
+        f"🧹 Texte normalisé : {_milliers(rapport['caracteres_avant'] - rapport['caracteres_apres'])} caractères "
+        f"({rapport['gain']:.0%}) et ≈ {_milliers(rapport['tokens_economises'])} tokens en moins, "
+        f"{rapport['lignes_retirees']} ligne(s) d'en-tête, de pied ou de numéro de page retirée(s)"
+    )
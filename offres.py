@@ -2,11 +2,13 @@
 Interface utilisateur pour la génération d'offres
 """
 import streamlit as st
-from pypdf import PdfReader
 from datetime import datetime
 import json
+import config
 import generateur_offres
 import database
+from extraction_pdf import extraire_pages, joindre_pages, pages_soumission
+from nettoyage import normaliser_pages, resume_normalisation
 
 
 def show_offres_tab(user, projets_antecedents):
@@ -16,7 +18,10 @@ def show_offres_tab(user, projets_antecedents):
     # Récupérer les soumissions qualifiées
     try:
         database.apply_supabase_auth()
-        soumissions = database.supabase.table('soumissions').select("*").eq(
+        # Colonnes affichées seulement : analyse_json porte l'empreinte et parfois le texte du PDF
+        soumissions = database.supabase.table('soumissions').select(
+            "id, nom_projet, score, pdf_sha256:analyse_json->>pdf_sha256"
+        ).eq(
             'entreprise_id', user['id']
         ).in_('recommendation', ['GO', 'PEUT-ÊTRE']).order('created_at', desc=True).execute()
         
@@ -61,19 +66,30 @@ def show_offres_tab(user, projets_antecedents):
     with tab1:
         st.subheader("2️⃣ Extraire les exigences")
         
+        # Texte du PDF déjà extrait lors de l'analyse de cette soumission
+        pages_analysees = pages_soumission(
+            soumission_selectionnee.get('pdf_sha256'),
+            lambda: database.get_pages_texte_soumission(soumission_selectionnee['id'])
+        )
+        if pages_analysees:
+            st.caption("📄 Le texte de l'appel d'offres analysé est disponible ; chargez un PDF seulement pour utiliser une autre version.")
+        
         uploaded_file = st.file_uploader(
             "📄 Charger l'appel d'offres complet (PDF)",
             type=['pdf'],
             key="offre_pdf"
         )
         
-        if uploaded_file and st.button("🔍 Extraire les exigences"):
+        if (uploaded_file or pages_analysees) and st.button("🔍 Extraire les exigences"):
             with st.spinner("🤖 Extraction en cours..."):
                 try:
-                    reader = PdfReader(uploaded_file)
-                    texte = " ".join([page.extract_text() or "" for page in reader.pages])
+                    pages = extraire_pages(uploaded_file)[1] if uploaded_file else pages_analysees
+                    pages, normalisation = normaliser_pages(pages)
+                    texte = joindre_pages(pages)
+                    if config.TEXTE_NORMALISATION_ENABLED:
+                        st.caption(resume_normalisation(normalisation))
                     
-                    exigences = generateur_offres.extraire_exigences_appel_offre(texte)
+                    exigences = generateur_offres.extraire_exigences_appel_offre(texte, pages)
                     
                     if exigences:
                         st.session_state.offre_data['exigences'] = exigences
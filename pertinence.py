@@ -0,0 +1,120 @@
+"""
+Sélection des passages pertinents d'un appel d'offres (index BM25 local)
+
+Quand le document dépasse le budget du prompt, il est découpé en passages
+d'environ TAILLE_PASSAGE mots ; les passages les mieux classés pour les
+termes recherchés (visite des lieux, date de clôture, cautionnement...)
+sont retenus dans la limite du budget, puis remis dans l'ordre du document.
+"""
+import math
+import re
+import unicodedata
+from collections import Counter
+from llm_budget import count_tokens
+
+TAILLE_PASSAGE = 180
+SEPARATEUR = "\n[...]\n"
+
+# Mots trop fréquents pour distinguer les passages
+MOTS_VIDES = set("""
+au aux avec ce ces dans de des du elle en et il ils la le les leur leurs lors mais ne ni nos notre ou
+par pas pour qu que qui sa se ses son sont sur ta un une vos votre est sera doit doivent tout tous
+toute toutes cette cet entre afin ainsi etre avoir
+""".split())
+
+
+def _sans_accents(texte: str) -> str:
+    return "".join(c for c in unicodedata.normalize("NFKD", texte) if not unicodedata.combining(c))
+
+
+def termes(texte: str) -> list:
+    """Mots normalisés (minuscules, sans accents, pluriel en s/x retiré), mots vides exclus"""
+    mots = re.findall(r"[a-z0-9]+", _sans_accents(texte.lower()))
+    return [
+        mot[:-1] if len(mot) > 4 and mot[-1] in "sx" else mot
+        for mot in mots if len(mot) > 2 and mot not in MOTS_VIDES
+    ]
+
+
+def decouper(texte: str, taille: int = TAILLE_PASSAGE) -> list:
+    """Passages d'environ `taille` mots, coupés en fin de ligne quand c'est possible"""
+    passages, courant, mots = [], [], 0
+    for ligne in texte.splitlines():
+        nb = len(ligne.split())
+        if not nb:
+            continue
+        if mots and mots + nb > taille:
+            passages.append("\n".join(courant))
+            courant, mots = [], 0
+        # Ligne très longue (pages jointes sans retour) : découpée par mots
+        ligne_mots = ligne.split()
+        while len(ligne_mots) > taille:
+            passages.append(" ".join(ligne_mots[:taille]))
+            ligne_mots = ligne_mots[taille:]
+        if ligne_mots:
+            courant.append(" ".join(ligne_mots))
+            mots += len(ligne_mots)
+    if courant:
+        passages.append("\n".join(courant))
+    return passages
+
+
+class IndexBM25:
+    """Index BM25 (Okapi) d'une liste de passages"""
+
+    def __init__(self, passages: list, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.frequences = [Counter(termes(passage)) for passage in passages]
+        self.longueurs = [sum(f.values()) for f in self.frequences]
+        self.longueur_moyenne = (sum(self.longueurs) / len(self.longueurs)) if self.longueurs else 0.0
+        documents = Counter(terme for f in self.frequences for terme in f)
+        n = len(passages)
+        self.idf = {
+            terme: math.log(1 + (n - df + 0.5) / (df + 0.5)) for terme, df in documents.items()
+        }
+
+    def scores(self, requete: list) -> list:
+        """Score de chaque passage pour les termes de la requête"""
+        requete = set(requete)
+        resultats = []
+        for frequences, longueur in zip(self.frequences, self.longueurs):
+            norme = self.k1 * (1 - self.b + self.b * longueur / (self.longueur_moyenne or 1))
+            resultats.append(sum(
+                self.idf[terme] * frequences[terme] * (self.k1 + 1) / (frequences[terme] + norme)
+                for terme in requete if terme in frequences
+            ))
+        return resultats
+
+
+def selectionner_passages(texte: str, requete: list, max_tokens: int, provider_type: str = None) -> str:
+    """
+    Texte tenant dans `max_tokens` : le document entier s'il y tient, sinon le
+    premier passage (identification du projet) puis les passages les mieux
+    classés pour `requete` (liste d'expressions), dans l'ordre du document et
+    séparés par « [...] ».
+    """
+    if count_tokens(texte, provider_type) <= max_tokens:
+        return texte
+    passages = decouper(texte)
+    if not passages:
+        return ""
+    scores = IndexBM25(passages).scores([t for expression in requete for t in termes(expression)])
+    ordre = [0] + sorted(range(1, len(passages)), key=lambda i: scores[i], reverse=True)
+
+    retenus, utilises = set(), 0
+    cout_separateur = count_tokens(SEPARATEUR, provider_type)
+    for i in ordre:
+        cout = count_tokens(passages[i], provider_type) + cout_separateur
+        if utilises + cout > max_tokens:
+            continue
+        retenus.add(i)
+        utilises += cout
+
+    morceaux, precedent = [], None
+    for i in sorted(retenus):
+        if morceaux:
+            morceaux.append(SEPARATEUR if i != precedent + 1 else "\n")
+        morceaux.append(passages[i])
+        precedent = i
+    return "".join(morceaux)
@@ -0,0 +1,113 @@
+"""
+Détection des appels d'offres quasi identiques (réémissions, addenda)
+
+Chaque texte extrait reçoit une empreinte compacte, conservée avec la
+soumission (analyse_json["empreinte"]) :
+- "minhash" : signature MinHash « bottom-k » des séquences de mots (shingles)
+  des SIMILARITE_PREFIXE_CARACTERES premiers caractères, pour estimer la
+  similarité de Jaccard entre deux documents lus en entier ou en partie
+- "lignes" : hachages courts des lignes normalisées, pour isoler les
+  passages ajoutés ou modifiés depuis une version antérieure
+"""
+import hashlib
+import heapq
+import re
+import config
+
+VERSION_EMPREINTE = 2
+TAILLE_SHINGLE = 5
+
+
+def _hacher(texte: str, octets: int) -> int:
+    return int.from_bytes(hashlib.blake2b(texte.encode("utf-8"), digest_size=octets).digest(), "big")
+
+
+def _normaliser_ligne(ligne: str) -> str:
+    return " ".join(re.findall(r"\w+", ligne.lower()))
+
+
+def _lignes(texte: str) -> list:
+    """Lignes normalisées non vides du texte, dans l'ordre"""
+    return [ligne for ligne in (_normaliser_ligne(l) for l in texte.splitlines()) if ligne]
+
+
+def _hash_ligne(ligne: str) -> str:
+    return f"{_hacher(ligne, 4):08x}"
+
+
+def calculer_empreinte(texte: str) -> dict:
+    """
+    Empreinte du texte brut d'un appel d'offres.
+    Les hachages MinHash tiennent sur 48 bits (entiers JSON sûrs côté JavaScript).
+    """
+    mots = re.findall(r"\w+", texte[:config.SIMILARITE_PREFIXE_CARACTERES].lower())
+    shingles = {
+        " ".join(mots[i:i + TAILLE_SHINGLE])
+        for i in range(max(1, len(mots) - TAILLE_SHINGLE + 1))
+    } if mots else set()
+    return {
+        "version": VERSION_EMPREINTE,
+        "minhash": heapq.nsmallest(
+            config.SIMILARITE_TAILLE_SIGNATURE, {_hacher(s, 6) for s in shingles}
+        ),
+        "lignes": sorted({_hash_ligne(ligne) for ligne in _lignes(texte)})
+    }
+
+
+def similarite(empreinte_a: dict, empreinte_b: dict) -> float:
+    """Similarité de Jaccard estimée (0 à 1) entre deux empreintes"""
+    a, b = set(empreinte_a.get("minhash") or []), set(empreinte_b.get("minhash") or [])
+    k = min(len(a), len(b))
+    if not k:
+        return 0.0
+    # Les k plus petits hachages de l'union forment un échantillon uniforme de l'union
+    union = heapq.nsmallest(k, a | b)
+    return sum(1 for h in union if h in a and h in b) / k
+
+
+def trouver_doublon(empreinte: dict, candidats: list, seuil: float = None):
+    """
+    Soumission la plus proche parmi `candidats` (dicts avec une clé "empreinte").
+    Retourne (candidat, similarité) si elle atteint le seuil, sinon None.
+    """
+    seuil = config.SIMILARITE_SEUIL if seuil is None else seuil
+    meilleur, meilleure_similarite = None, 0.0
+    for candidat in candidats:
+        empreinte_candidat = candidat.get("empreinte") or {}
+        if empreinte_candidat.get("version") != VERSION_EMPREINTE:
+            continue
+        score = similarite(empreinte, empreinte_candidat)
+        if score > meilleure_similarite:
+            meilleur, meilleure_similarite = candidat, score
+    if meilleur is None or meilleure_similarite < seuil:
+        return None
+    return meilleur, meilleure_similarite
+
+
+def passages_modifies(texte: str, empreinte_precedente: dict) -> tuple:
+    """
+    Lignes du texte absentes de la version précédente, dans l'ordre du
+    document (les lignes non contiguës sont séparées par « [...] »).
+    Retourne (texte des passages, {"lignes_nouvelles", "lignes_retirees"}).
+    """
+    anciennes = set(empreinte_precedente.get("lignes") or [])
+    originales = [ligne.strip() for ligne in texte.splitlines()]
+    passages, nouvelles, actuelles, precedente_gardee = [], 0, set(), True
+    for originale in originales:
+        ligne = _normaliser_ligne(originale)
+        if not ligne:
+            continue
+        hachage = _hash_ligne(ligne)
+        actuelles.add(hachage)
+        if hachage in anciennes:
+            precedente_gardee = True
+            continue
+        if precedente_gardee and passages:
+            passages.append("[...]")
+        passages.append(originale)
+        nouvelles += 1
+        precedente_gardee = False
+    return "\n".join(passages), {
+        "lignes_nouvelles": nouvelles,
+        "lignes_retirees": len(anciennes - actuelles)
+    }
@@ -1,19 +1,71 @@
 """
 Fonctions utilitaires
 """
-from datetime import timedelta
+from datetime import date as _date, timedelta
 
 
-def is_business_day(date):
-    """Vérifie si une date est un jour ouvrable (lundi-vendredi)"""
-    return date.weekday() < 5
+def _paques(annee):
+    """Dimanche de Pâques (calendrier grégorien, algorithme de Meeus)"""
+    a, b, c = annee % 19, annee // 100, annee % 100
+    d, e = b // 4, b % 4
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 19 * l) // 433
+    mois = (h + l - 7 * m + 90) // 25
+    return _date(annee, mois, (h + l - 7 * m + 33 * mois + 19) % 32)
 
 
-def add_business_days(start_date, days):
+def _lundi(annee, mois, rang):
+    """rang-ième lundi du mois"""
+    premier = _date(annee, mois, 1)
+    return premier + timedelta(days=(7 - premier.weekday()) % 7 + 7 * (rang - 1))
+
+
+def quebec_holidays(year):
+    """Jours fériés du Québec (Loi sur les normes du travail) pour une année"""
+    paques = _paques(year)
+    patriotes = _date(year, 5, 24) - timedelta(days=_date(year, 5, 24).weekday())
+    return {
+        _date(year, 1, 1),
+        paques - timedelta(days=2),
+        paques + timedelta(days=1),
+        patriotes,
+        _date(year, 6, 24),
+        _date(year, 7, 1),
+        _lundi(year, 9, 1),
+        _lundi(year, 10, 2),
+        _date(year, 12, 25)
+    }
+
+
+def is_business_day(date, holidays=None):
+    """Vérifie si une date est un jour ouvrable (lundi-vendredi, hors `holidays`)"""
+    return date.weekday() < 5 and (not holidays or date not in holidays)
+
+
+def add_business_days(start_date, days, holidays=None):
     """Ajoute un nombre de jours ouvrables à une date"""
     current = start_date
     while days > 0:
         current += timedelta(days=1)
-        if is_business_day(current):
+        if is_business_day(current, holidays):
             days -= 1
     return current
+
+
+def business_days_between(start_date, end_date, holidays=None):
+    """
+    Jours ouvrables après start_date jusqu'à end_date inclus
+    (add_business_days(start_date, n) == end_date pour un end_date ouvrable) ;
+    négatif si end_date précède start_date.
+    """
+    if end_date < start_date:
+        return -business_days_between(end_date, start_date, holidays)
+    count, current = 0, start_date
+    while current < end_date:
+        current += timedelta(days=1)
+        if is_business_day(current, holidays):
+            count += 1
+    return count